@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'user.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +58,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+TEST_RUNNER = 'main.test_runner.TestRunner'
+
 ROOT_URLCONF = 'main.urls'
 AUTH_USER_MODEL = 'user.User'
 
@@ -88,6 +92,59 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use django.core.cache.backends.redis.RedisCache or a memcached backend in
+# production so cached role maps are shared between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+TEAM_ROLE_CACHE_ALIAS = 'default'
+TEAM_ROLE_CACHE_TIMEOUT = 300
+
+# Task activity is queued and written in batches by a background thread.
+# ACTIVITY_LOG_ASYNC=0 writes synchronously inside the request's transaction
+# instead; main.test_runner.TestRunner always does so for the test suite.
+ACTIVITY_LOG_WRITER = {
+    'ASYNC': os.environ.get('ACTIVITY_LOG_ASYNC', '1') != '0',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_QUEUE_SIZE': 10000,
+}
+
+# user.retention: archive_activity_logs moves logs older than DAYS (or the
+# per-action override in ACTIONS; None keeps them forever) into gzip NDJSON
+# files under MEDIA_ROOT and keeps daily per-team/per-action rollups.
+ACTIVITY_LOG_RETENTION = {
+    'DAYS': 365,
+    'ACTIONS': {'updated': 90},
+    'BATCH_SIZE': 5000,
+}
+
+# user.changes: the changes feeds only return rows at least this many seconds
+# old, so rows from transactions that commit out of order are not skipped.
+# Keep it above the longest write transaction plus the activity log writer's
+# FLUSH_INTERVAL.
+CHANGES_FEED_LAG = 5
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Fan-out of task events to /api/tasks/stream/ subscribers. The in-process
+# broker only reaches streams served by the same process.
+EVENT_BROKER = {
+    'BACKEND': 'user.events.InProcessBroker',
+    'OPTIONS': {
+        'MAX_SUBSCRIBERS': 1000,
+        'QUEUE_SIZE': 100,
+    },
+}
+EVENT_STREAM_HEARTBEAT = 15
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -131,7 +188,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -143,6 +200,19 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'user.pagination.StandardResultsSetPagination',
     'PAGE_SIZE': 10,
+    # To encode and decode JSON with orjson, replace JSONRenderer with
+    # user.renderers.ORJSONRenderer and JSONParser with
+    # user.renderers.ORJSONParser. Their output matches the stock classes, and
+    # they fall back to the stdlib when orjson is not installed.
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 from datetime import timedelta
@@ -151,6 +221,26 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# user.authentication.CachedJWTAuthentication: validated tokens are cached
+# for TOKEN_TIMEOUT seconds (never past their expiry) and users for
+# USER_TIMEOUT seconds. STATELESS_READS lets safe requests to views with
+# stateless_auth = True skip the user lookup entirely.
+JWT_AUTH_CACHE = {
+    'ALIAS': 'default',
+    'TOKEN_TIMEOUT': 300,
+    'USER_TIMEOUT': 60,
+    'STATELESS_READS': False,
+}
+
+# user.metrics.MetricsMiddleware: per-route histograms served at /metrics to
+# ALLOWED_IPS. Set SLOW_REQUEST_MS to log slower requests with their SQL.
+METRICS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': None,
+    'MAX_CAPTURED_QUERIES': 50,
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+}
+
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
     'SECURITY_DEFINITIONS': {
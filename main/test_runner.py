@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite with the activity log writer in synchronous mode, so entries land in each test's transaction."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.sync_activity = override_settings(ACTIVITY_LOG_WRITER={**settings.ACTIVITY_LOG_WRITER, 'ASYNC': False})
+        self.sync_activity.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.sync_activity.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,211 @@
+import atexit
+import logging
+import queue
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ActivityEntry = namedtuple('ActivityEntry', 'task_id team_id user_id action note timestamp assignee_id')
+
+_STOP = object()
+
+
+def activity_entry(task, action, note=None, user_id=None):
+    """
+    Build a queued log entry for ``task``. An ``assigned`` entry without a
+    note has its assignee's name resolved in bulk when the batch is written,
+    so building it never loads the user row.
+    """
+    if user_id is None:
+        user_id = task.created_by_id
+    if note is None and action == 'assigned':
+        field = task._meta.get_field('assigned_to')
+        if task.assigned_to_id is None or field.is_cached(task):
+            note = f"Assigned to {task.assigned_to}"
+    return ActivityEntry(task.pk, task.team_id, user_id, action, note, timezone.now(), task.assigned_to_id)
+
+
+def move_activity(tasks):
+    """Point the logs of ``tasks`` that changed team at their new team."""
+    from .models import ActivityLog
+
+    for task in tasks:
+        if task.has_changed('team'):
+            ActivityLog.objects.filter(task_id=task.pk).update(team_id=task.team_id)
+
+
+def build_logs(entries, current_teams=False):
+    from .models import ActivityLog, Task, User
+
+    assignee_ids = {e.assignee_id for e in entries if e.note is None and e.assignee_id}
+    assignees = User.objects.in_bulk(assignee_ids) if assignee_ids else {}
+    # Queued entries can outlive a move of their task to another team.
+    teams = dict(
+        Task.objects.filter(pk__in={e.task_id for e in entries}).values_list('pk', 'team_id')
+    ) if current_teams else {}
+    return [
+        ActivityLog(
+            task_id=e.task_id,
+            team_id=teams.get(e.task_id, e.team_id),
+            user_id=e.user_id,
+            action=e.action,
+            note=e.note if e.note is not None else f"Assigned to {assignees.get(e.assignee_id)}",
+            timestamp=e.timestamp,
+        )
+        for e in entries
+    ]
+
+
+class ActivityLogWriter:
+    """
+    Queues activity entries and writes them with ``bulk_create``.
+
+    In asynchronous mode a daemon thread drains the queue whenever
+    ``batch_size`` entries are waiting or ``flush_interval`` seconds have
+    passed; entries are only queued once the surrounding transaction
+    commits. In synchronous mode entries are written immediately in the
+    caller's transaction, which is what the test suite uses. Pending
+    entries are flushed at interpreter exit.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=1.0, asynchronous=True, max_queue_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.asynchronous = asynchronous
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.ACTIVITY_LOG_WRITER
+        return cls(
+            batch_size=options.get('BATCH_SIZE', 500),
+            flush_interval=options.get('FLUSH_INTERVAL', 1.0),
+            asynchronous=options.get('ASYNC', True),
+            max_queue_size=options.get('MAX_QUEUE_SIZE', 10000),
+        )
+
+    def log(self, entries):
+        entries = list(entries)
+        if not entries:
+            return
+        if not self.asynchronous:
+            self.write(entries)
+            return
+        transaction.on_commit(lambda: self.enqueue(entries))
+
+    def enqueue(self, entries):
+        self.start()
+        overflow = []
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                overflow.append(entry)
+        if overflow:
+            logger.warning('Activity log queue full, writing %d entries inline', len(overflow))
+            self.write_safely(overflow)
+
+    def write(self, entries):
+        from .models import ActivityLog
+
+        ActivityLog.objects.bulk_create(build_logs(entries, self.asynchronous), batch_size=self.batch_size)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, name='activity-log-writer', daemon=True)
+                self._thread.start()
+
+    def run(self):
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        self.queue.task_done()
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                self.write_batch(batch)
+        finally:
+            connection.close()
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        try:
+            self.write_safely(batch)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def write_safely(self, entries):
+        """Write ``entries``, retrying a failed batch in halves so that only the bad entries are lost."""
+        try:
+            self.write(entries)
+        except Exception:
+            if len(entries) == 1:
+                logger.exception('Failed to write activity log entry %r', entries[0])
+                return
+            middle = len(entries) // 2
+            self.write_safely(entries[:middle])
+            self.write_safely(entries[middle:])
+
+    def flush(self):
+        """Block until every queued entry has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActivityLogWriter.from_settings()
+                atexit.register(_writer.stop)
+    return _writer
+
+
+@receiver(setting_changed)
+def reset_writer(setting, **kwargs):
+    global _writer
+    if setting == 'ACTIVITY_LOG_WRITER' and _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def log_activity(entries):
+    get_writer().log(entries)
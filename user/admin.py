@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Company, Team, TeamMembership, Task, ActivityLog
+from .models import User, Company, Team, TeamMembership, Task, ActivityLog, ActivityLogArchive, ActivityLogRollup
 # Register your models here.
 
 @admin.register(ActivityLog)
@@ -12,4 +12,6 @@ admin.site.register(User)
 admin.site.register(Company)
 admin.site.register(Team)
 admin.site.register(TeamMembership)
-admin.site.register(Task)
\ No newline at end of file
+admin.site.register(Task)
+admin.site.register(ActivityLogArchive)
+admin.site.register(ActivityLogRollup)
\ No newline at end of file
@@ -0,0 +1,214 @@
+import asyncio
+import functools
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from .authentication import CachedJWTAuthentication
+from .events import BrokerFull, get_broker
+from .models import Task
+from .roles import TeamRoles
+from .serializers import TaskSerializer, UserProfileSerializer
+from .views import ActivityLogViewSet, TaskViewSet
+
+
+async def authenticate(request, query_token=False):
+    """
+    Async counterpart of ``CachedJWTAuthentication``: validate the bearer
+    token and load its user through the cache or the async ORM. With
+    ``query_token``, a ``token`` query parameter is accepted too, for
+    EventSource clients that cannot send headers. Returns ``None`` when the
+    request is not authenticated.
+    """
+    user, _ = await authenticate_token(request, query_token)
+    return user
+
+
+async def authenticate_token(request, query_token=False):
+    """``authenticate`` returning ``(user, validated_token)``, or ``(None, None)``."""
+    backend = CachedJWTAuthentication()
+    header = backend.get_header(request)
+    raw_token = backend.get_raw_token(header) if header is not None else None
+    if raw_token is None and query_token:
+        raw_token = request.GET.get('token', '').encode() or None
+    if raw_token is None:
+        return None, None
+    try:
+        token = await backend.aget_validated_token(raw_token)
+        return await backend.aget_user(token), token
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None, None
+
+
+def unauthorized():
+    return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+
+def format_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+
+
+async def event_stream(broker, subscription, heartbeat, team_ids=None, expires_at=None):
+    """
+    Every ``heartbeat`` seconds the subscription's teams are re-read with
+    the ``team_ids`` coroutine, so a removed member stops receiving that
+    team's events, and an idle stream gets a ping. At ``expires_at`` (a Unix
+    time) the stream sends ``token.expired`` and ends.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        yield ': connected\n\n'
+        refresh_at = loop.time() + heartbeat
+        while True:
+            timeout = refresh_at - loop.time()
+            if expires_at is not None:
+                if expires_at <= time.time():
+                    yield 'event: token.expired\ndata: {}\n\n'
+                    return
+                timeout = min(timeout, expires_at - time.time())
+            try:
+                event = await subscription.get(timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                event = None
+            if loop.time() >= refresh_at:
+                if team_ids is not None:
+                    subscription.team_ids = frozenset(await team_ids())
+                refresh_at = loop.time() + heartbeat
+                if event is None:
+                    yield ': ping\n\n'
+            if event is not None and event['team'] in subscription.team_ids:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def task_stream(request):
+    """
+    Server-sent events for task changes in the teams the user belongs to.
+    Team membership is re-read on every heartbeat and the stream closes
+    when the token expires.
+    """
+    user, token = await authenticate_token(request, query_token=True)
+    if user is None:
+        return unauthorized()
+
+    async def team_ids():
+        return list(await TeamRoles(user).aload())
+
+    broker = get_broker()
+    try:
+        subscription = broker.subscribe(await team_ids())
+    except BrokerFull:
+        return JsonResponse({'detail': 'Too many open streams, retry later.'}, status=503)
+    response = StreamingHttpResponse(
+        event_stream(broker, subscription, settings.EVENT_STREAM_HEARTBEAT, team_ids, token.get('exp')),
+        content_type='text/event-stream',
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def build_view(viewset, request, user, action):
+    """
+    Instantiate ``viewset`` around ``request`` without dispatching it, so
+    its querysets, filter backends and paginator can be reused from async
+    code. The user's team roles are loaded up front with the async ORM.
+    """
+    view = viewset(action_map={'get': action}, args=(), kwargs={}, format_kwarg=None)
+    view.request = view.initialize_request(request)
+    view.request.user = user
+    view.request.team_roles = TeamRoles(user)
+    await view.request.team_roles.aload()
+    return view
+
+
+def render(data, status=200):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def api_errors(view_func):
+    """Answer DRF exceptions raised by an async view through ``exception_handler``, as the sync views do."""
+    @functools.wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        except APIException as exc:
+            response = exception_handler(exc, {'request': request, 'args': args, 'kwargs': kwargs})
+            if response is None:
+                raise
+            rendered = render(response.data, status=response.status_code)
+            for header, value in response.items():
+                if header.lower() != 'content-type':
+                    rendered[header] = value
+            return rendered
+    return wrapper
+
+
+async def paginated_list(view):
+    # Filter backends and the paginator may touch the database (search index
+    # discovery, filter validation), so they run on a worker thread.
+    row_serializer = view.get_row_serializer()
+    if row_serializer is not None:
+        queryset = await sync_to_async(view.list_queryset)(row_serializer)
+        serialize = row_serializer.serialize
+    else:
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+        serialize = lambda rows: view.get_serializer(rows, many=True).data
+    paginator = view.paginator
+    page = await sync_to_async(paginator.page_queryset)(queryset, view.request, view)
+    if page is None:
+        return render(serialize([row async for row in queryset]))
+    if paginator.page_number is not None:
+        rows = await sync_to_async(paginator.page_number.paginate_queryset)(page, view.request, view)
+    else:
+        rows = paginator.finish_page([row async for row in page])
+    data = serialize(rows)
+    response = await sync_to_async(view.get_paginated_response)(data)
+    return render(response.data)
+
+
+@api_errors
+async def task_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    return await paginated_list(await build_view(TaskViewSet, request, user, 'list'))
+
+
+@api_errors
+async def task_detail(request, pk):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    view = await build_view(TaskViewSet, request, user, 'retrieve')
+    try:
+        task = await view.get_queryset().aget(pk=pk)
+    except Task.DoesNotExist:
+        return render({'detail': 'No Task matches the given query.'}, status=404)
+    return render(TaskSerializer(task).data)
+
+
+@api_errors
+async def activity_log_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    view = await build_view(ActivityLogViewSet, request, user, 'list')
+    return await paginated_list(view)
+
+
+@api_errors
+async def profile_me(request):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    return render(UserProfileSerializer(user).data)
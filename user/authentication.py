@@ -0,0 +1,159 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+TOKEN_KEY = 'jwt-token:{}'
+USER_KEY = 'jwt-user:{}'
+# The user columns kept in the cache: what authentication, permissions and the
+# profile endpoint read. Anything else is loaded from the database on access.
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def auth_settings():
+    return {'ALIAS': 'default', 'TOKEN_TIMEOUT': 300, 'USER_TIMEOUT': 60, 'STATELESS_READS': False,
+            **getattr(settings, 'JWT_AUTH_CACHE', {})}
+
+
+def auth_cache():
+    return caches[auth_settings()['ALIAS']]
+
+
+def invalidate_user(user_ids):
+    keys = [USER_KEY.format(pk) for pk in set(user_ids)]
+    auth_cache().delete_many(keys)
+    # A request reading before the commit can re-cache the old user.
+    transaction.on_commit(lambda: auth_cache().delete_many(keys))
+
+
+def token_key(raw_token):
+    return TOKEN_KEY.format(hashlib.sha256(raw_token).hexdigest())
+
+
+def token_entry(token):
+    return jwt_settings.AUTH_TOKEN_CLASSES.index(type(token)), token.payload
+
+
+def token_timeout(token):
+    return min(auth_settings()['TOKEN_TIMEOUT'], int(token.payload.get('exp', 0) - time.time()))
+
+
+def cached_token(raw_token, entry):
+    """The token for a cached ``token_entry``, or None when there is none or it has expired."""
+    if entry is None:
+        return None
+    index, payload = entry
+    if payload.get('exp', 0) <= time.time():
+        return None
+    return jwt_settings.AUTH_TOKEN_CLASSES[index](raw_token, verify=False)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that caches both halves of its work.
+
+    Validated token payloads are cached under a hash of the raw token until
+    ``TOKEN_TIMEOUT`` or the token's own expiry, whichever comes first, so
+    repeat requests skip signature and claim checks. Users are cached for
+    ``USER_TIMEOUT`` seconds and evicted whenever the user is saved or
+    deleted, so deactivation and password changes apply on the next request.
+    Only ``USER_FIELDS`` and, when token revocation is on, a digest of the
+    password hash are cached; the user is rebuilt with the other fields
+    deferred.
+
+    With ``STATELESS_READS`` enabled, safe requests to views that set
+    ``stateless_auth = True`` get a ``TokenUser`` built from the claims and
+    touch neither the cache nor the database. Such reads are not affected
+    by deactivation until the token expires.
+    """
+
+    def authenticate(self, request):
+        self.stateless = (
+            request.method in SAFE_METHODS
+            and auth_settings()['STATELESS_READS']
+            and getattr((request.parser_context or {}).get('view'), 'stateless_auth', False)
+        )
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        key = token_key(raw_token)
+        cache = auth_cache()
+        token = cached_token(raw_token, cache.get(key))
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            if (timeout := token_timeout(token)) > 0:
+                cache.set(key, token_entry(token), timeout)
+        return token
+
+    async def aget_validated_token(self, raw_token):
+        key = token_key(raw_token)
+        cache = auth_cache()
+        token = cached_token(raw_token, await cache.aget(key))
+        if token is None:
+            # Signature and claim checks are CPU-only; just the cache is awaited.
+            token = super().get_validated_token(raw_token)
+            if (timeout := token_timeout(token)) > 0:
+                await cache.aset(key, token_entry(token), timeout)
+        return token
+
+    def get_user(self, validated_token):
+        if getattr(self, 'stateless', False):
+            if jwt_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_('Token contained no recognizable user identification'))
+            return jwt_settings.TOKEN_USER_CLASS(validated_token)
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+        key = USER_KEY.format(user_id)
+        cache = auth_cache()
+        entry = cache.get(key)
+        if entry is None:
+            user = self.user_model.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first()
+            if user is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            entry = self.cache_entry(user)
+            cache.set(key, entry, auth_settings()['USER_TIMEOUT'])
+        return self.check_user(entry, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        key = USER_KEY.format(user_id)
+        cache = auth_cache()
+        entry = await cache.aget(key)
+        if entry is None:
+            user = await self.user_model.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+            if user is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            entry = self.cache_entry(user)
+            await cache.aset(key, entry, auth_settings()['USER_TIMEOUT'])
+        return self.check_user(entry, validated_token)
+
+    def cache_entry(self, user):
+        revoke = get_md5_hash_password(user.password) if jwt_settings.CHECK_REVOKE_TOKEN else None
+        return {field: getattr(user, field) for field in USER_FIELDS}, revoke
+
+    def build_user(self, values):
+        # from_db() takes the loaded values in concrete field order.
+        names = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in values]
+        return self.user_model.from_db(self.user_model.objects.db, names, [values[name] for name in names])
+
+    def check_user(self, entry, validated_token):
+        values, revoke = entry
+        user = self.build_user(values)
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != revoke:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
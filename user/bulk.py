@@ -0,0 +1,166 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .activity import activity_entry, log_activity, move_activity
+from .events import publish_task_events, task_event
+from .models import Task, TeamMembership, User
+from .roles import get_team_roles, as_pk
+from .serializers import TaskSerializer, TaskUpdateMemberSerializer
+from .search import index_objects
+from .stats import apply_deltas, task_deltas
+
+MAX_OPERATIONS = 500
+OPERATIONS = ('create', 'update', 'assign', 'delete')
+
+
+class BulkTaskProcessor:
+    """
+    Applies a list of task operations in one transaction with the same
+    permission and validation rules as the single-item endpoints.
+
+    Each operation is a dict with an ``op`` key:
+
+    * ``{"op": "create", "data": {...}}``
+    * ``{"op": "update", "id": 1, "data": {...}}``
+    * ``{"op": "assign", "id": 1, "user_id": 2}``
+    * ``{"op": "delete", "id": 1}``
+
+    Tasks, assignees and memberships are loaded with one query each, rows
+    are written with ``bulk_create``/``bulk_update`` and the matching
+    activity entries are logged in a single batch.
+    """
+
+    def __init__(self, request, queryset):
+        self.request = request
+        self.queryset = queryset
+        self.roles = get_team_roles(request)
+        self.created = []
+        self.dirty = {}
+        self.activity = []
+        self.actions = []
+
+    def run(self, operations):
+        with transaction.atomic():
+            self.prefetch(operations)
+            results = [self.apply(index, operation) for index, operation in enumerate(operations)]
+            self.save()
+        for result in results:
+            task = result.pop('task', None)
+            if task is not None:
+                result['data'] = TaskSerializer(task).data
+        return results
+
+    def prefetch(self, operations):
+        operations = [op for op in operations if isinstance(op, dict)]
+        task_ids = {as_pk(op.get('id')) for op in operations if op.get('op') != 'create'}
+        self.tasks = self.queryset.in_bulk([pk for pk in task_ids if pk is not None])
+
+        user_ids = {as_pk(op.get('user_id')) for op in operations if op.get('op') == 'assign'}
+        user_ids.discard(None)
+        self.users = User.objects.in_bulk(user_ids) if user_ids else {}
+        team_ids = {task.team_id for task in self.tasks.values()}
+        self.memberships = set(
+            TeamMembership.objects.filter(team_id__in=team_ids, user_id__in=user_ids).values_list('team_id', 'user_id')
+        ) if user_ids and team_ids else set()
+
+    def apply(self, index, operation):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in OPERATIONS:
+            return self.result(index, 400, detail=f"Unknown operation, expected one of {', '.join(OPERATIONS)}")
+        if not isinstance(operation.get('data') or {}, dict):
+            return self.result(index, 400, detail='data must be an object')
+        if op == 'create':
+            return self.create(index, operation)
+        task = self.tasks.get(as_pk(operation.get('id')))
+        if task is None or task.is_deleted:
+            return self.result(index, 404, detail='Not found.')
+        return getattr(self, op)(index, task, operation)
+
+    def create(self, index, operation):
+        data = operation.get('data') or {}
+        if not self.roles.is_admin(data.get('team')):
+            return self.result(index, 403, detail='Only admins can create tasks')
+        serializer = TaskSerializer(data=data)
+        if not serializer.is_valid():
+            return self.result(index, 400, errors=serializer.errors)
+        task = Task(**serializer.validated_data, created_by=self.request.user)
+        self.created.append(task)
+        return self.result(index, 201, task=task)
+
+    def update(self, index, task, operation):
+        data = operation.get('data') or {}
+        if self.roles.is_admin(task.team_id):
+            serializer = TaskSerializer(task, data=data, partial=True)
+        elif self.roles.is_member(task.team_id):
+            serializer = TaskUpdateMemberSerializer(task, data=data, partial=True)
+        else:
+            return self.result(index, 403, detail='Not allowed')
+        if not serializer.is_valid():
+            return self.result(index, 400, errors=serializer.errors)
+        assigned_before = task.assigned_to_id
+        for attr, value in serializer.validated_data.items():
+            setattr(task, attr, value)
+        action = 'assigned' if task.assigned_to_id != assigned_before else 'updated'
+        note = None if action == 'assigned' else f"Task '{task.title}' updated"
+        self.mark_dirty(task, action, note)
+        return self.result(index, 200, task=task)
+
+    def assign(self, index, task, operation):
+        if not self.roles.is_admin(task.team_id):
+            return self.result(index, 403, detail='Only admins can assign tasks')
+        user = self.users.get(as_pk(operation.get('user_id')))
+        if user is None:
+            return self.result(index, 404, detail='Not found.')
+        if (task.team_id, user.pk) not in self.memberships:
+            return self.result(index, 400, detail='User not a member of the team')
+        task.assigned_to = user
+        self.mark_dirty(task, 'assigned')
+        return self.result(index, 200, task=task)
+
+    def delete(self, index, task, operation):
+        if not self.roles.is_admin(task.team_id):
+            return self.result(index, 403, detail='Only admins can delete tasks')
+        task.is_deleted = True
+        task.deleted_at = timezone.now()
+        self.mark_dirty(task, 'deleted', f"Task '{task.title}' deleted")
+        return self.result(index, 204)
+
+    def mark_dirty(self, task, action, note=None):
+        self.dirty[task.pk] = task
+        self.activity.append(activity_entry(task, action, note))
+        self.actions.append((task, action))
+
+    def save(self):
+        now = timezone.now()
+        deltas = task_deltas(self.created, created=True)
+        deltas.update(task_deltas(self.dirty.values()))
+        reindex = [task for task in self.dirty.values() if task.changed_fields & {'title', 'description'}]
+        if self.created:
+            for task in self.created:
+                task.created_at = task.updated_at = now
+            Task.objects.bulk_create(self.created)
+            for task in self.created:
+                task._loaded_values = task._snapshot()
+        if self.dirty:
+            tasks = list(self.dirty.values())
+            fields = set().union(*(task.changed_fields for task in tasks)) | {'updated_at'}
+            for task in tasks:
+                task.updated_at = now
+            Task.objects.bulk_update(tasks, sorted(fields))
+            move_activity(tasks)
+            for task in tasks:
+                task._loaded_values = task._snapshot()
+        apply_deltas(deltas)
+        index_objects(Task, self.created + reindex)
+        entries = [activity_entry(task, 'created', f"Task '{task.title}' created") for task in self.created]
+        log_activity(entries + self.activity)
+        publish_task_events(
+            [task_event(task, 'created') for task in self.created] +
+            [task_event(task, action) for task, action in self.actions]
+        )
+
+    def result(self, index, status, task=None, **extra):
+        result = {'index': index, 'status': status, **extra}
+        if task is not None:
+            result['task'] = task
+        return result
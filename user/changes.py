@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def encode_token(*values):
+    data = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(data)
+        assert isinstance(values, list)
+    except (TypeError, ValueError, AssertionError):
+        raise ValidationError({'since': 'Invalid token.'})
+    return values
+
+
+def get_limit(request):
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValidationError({'limit': 'A valid integer is required.'})
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def settled_before():
+    """
+    Rows stamped after this moment are held back from the feeds. A row
+    stamped or numbered before one already returned can still be waiting to
+    commit; holding recent rows back keeps the token from moving past it.
+    """
+    return timezone.now() - timedelta(seconds=getattr(settings, 'CHANGES_FEED_LAG', 5))
+
+
+def task_changes(queryset, request):
+    """
+    Tasks changed after the ``since`` token, oldest first, as
+    ``(rows, next_token, has_more)``. The token is the ``(updated_at, id)``
+    of the last row returned; soft-deleted rows are included so the caller
+    can emit tombstones.
+
+    Only tasks the user can currently see are returned. When the user leaves
+    a team its tasks stop appearing without tombstones, so clients should
+    drop cached tasks of teams no longer in their team list.
+    """
+    since = request.query_params.get('since')
+    if since:
+        try:
+            updated_at, pk = decode_token(since)
+            updated_at = parse_datetime(updated_at)
+            assert updated_at is not None and isinstance(pk, int)
+        except (TypeError, ValueError, AssertionError):
+            raise ValidationError({'since': 'Invalid token.'})
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+    limit = get_limit(request)
+    rows = list(queryset.filter(updated_at__lte=settled_before()).order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        since = encode_token(rows[-1].updated_at.isoformat(), rows[-1].pk)
+    return rows, since or '', has_more
+
+
+def activity_changes(queryset, request):
+    """
+    Activity log rows with an id above the ``since`` token, oldest first.
+    Ids are not assigned in timestamp order, so a page stops below the
+    lowest id that is not settled yet rather than skipping over it.
+    """
+    since = request.query_params.get('since')
+    if since:
+        values = decode_token(since)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ValidationError({'since': 'Invalid token.'})
+        queryset = queryset.filter(id__gt=values[0])
+    pending = queryset.filter(timestamp__gt=settled_before()).aggregate(first=Min('id'))['first']
+    if pending is not None:
+        queryset = queryset.filter(id__lt=pending)
+    limit = get_limit(request)
+    rows = list(queryset.order_by('id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        since = encode_token(rows[-1].pk)
+    return rows, since or '', has_more
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class BrokerFull(Exception):
+    pass
+
+
+class Subscription:
+    """
+    One stream's bounded event queue. When a slow client lets the queue
+    fill up the oldest event is dropped, so memory per subscriber never
+    exceeds ``queue_size`` events. ``team_ids`` may be replaced while the
+    stream is open.
+    """
+
+    def __init__(self, team_ids, loop, queue_size):
+        self.team_ids = frozenset(team_ids)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def deliver(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    """
+    Fans task events out to the subscriptions of the current process.
+
+    Events may be published from any thread; they are handed to each
+    subscriber's event loop with ``call_soon_threadsafe``. Deployments with
+    several processes need a backend built on a shared channel (e.g. Redis
+    pub/sub) that exposes the same ``subscribe``/``unsubscribe``/``publish``
+    interface.
+    """
+
+    def __init__(self, max_subscribers=1000, queue_size=100):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.subscriptions = set()
+        self.published = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, team_ids):
+        with self._lock:
+            if len(self.subscriptions) >= self.max_subscribers:
+                raise BrokerFull
+            subscription = Subscription(team_ids, asyncio.get_running_loop(), self.queue_size)
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscriptions.discard(subscription)
+            self.dropped += subscription.dropped
+
+    def publish(self, event):
+        with self._lock:
+            self.published += 1
+            targets = [s for s in self.subscriptions if event['team'] in s.team_ids]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            subscriptions = list(self.subscriptions)
+        return {
+            'subscribers': len(subscriptions),
+            'max_subscribers': self.max_subscribers,
+            'queued': sum(s.queue.qsize() for s in subscriptions),
+            'published': self.published,
+            'dropped': self.dropped + sum(s.dropped for s in subscriptions),
+        }
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = settings.EVENT_BROKER
+                options = {key.lower(): value for key, value in config.get('OPTIONS', {}).items()}
+                _broker = import_string(config['BACKEND'])(**options)
+    return _broker
+
+
+def task_event(task, action):
+    return {
+        'event': f'task.{action}',
+        'team': task.team_id,
+        'data': {
+            'id': task.pk,
+            'team': task.team_id,
+            'title': task.title,
+            'status': task.status,
+            'assigned_to': task.assigned_to_id,
+            'due_date': task.due_date.isoformat() if task.due_date else None,
+            'is_deleted': task.is_deleted,
+            'updated_at': task.updated_at.isoformat() if task.updated_at else None,
+        },
+    }
+
+
+def publish_task_events(events):
+    """Publish ``events`` once the current transaction commits."""
+    events = list(events)
+    if not events:
+        return
+
+    def publish():
+        broker = get_broker()
+        for event in events:
+            broker.publish(event)
+
+    transaction.on_commit(publish)
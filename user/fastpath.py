@@ -0,0 +1,90 @@
+from rest_framework import serializers
+
+from .metrics import timed_serialization
+
+
+class Unsupported(Exception):
+    pass
+
+
+# Field classes whose to_representation() returns database values unchanged.
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def converter(field):
+    for base in IDENTITY_FIELDS:
+        if isinstance(field, base) and type(field).to_representation is base.to_representation:
+            return None
+    return field.to_representation
+
+
+class RowSerializer:
+    """
+    Read-only fast path for a ``ModelSerializer``.
+
+    The serializer's fields are compiled once into ``(key, column,
+    converter)`` accessors over ``.values()`` rows, so list responses are
+    built without instantiating models or walking DRF's per-field
+    machinery. Nested serializers become joined ``relation__column``
+    lookups. The output is identical to ``serializer.data``; serializers
+    with fields that cannot be read from a column raise ``Unsupported``.
+    """
+
+    def __init__(self, serializer):
+        self.plan = self.compile(serializer)
+
+    def compile(self, serializer, prefix=''):
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise Unsupported(f'{name}: source {field.source!r}')
+            column = prefix + field.source
+            if isinstance(field, serializers.ModelSerializer):
+                pk_column = f'{column}__{field.Meta.model._meta.pk.name}'
+                plan.append((name, pk_column, self.compile(field, prefix=column + '__')))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise Unsupported(f'{name}: pk_field')
+                plan.append((name, column, None))
+            elif isinstance(field, (
+                serializers.RelatedField, serializers.ManyRelatedField,
+                serializers.BaseSerializer, serializers.SerializerMethodField,
+            )):
+                raise Unsupported(f'{name}: {type(field).__name__}')
+            else:
+                plan.append((name, column, converter(field)))
+        return plan
+
+    @property
+    def columns(self):
+        return list(self.walk(self.plan))
+
+    def walk(self, plan):
+        for name, column, convert in plan:
+            yield column
+            if isinstance(convert, list):
+                yield from self.walk(convert)
+
+    def values(self, queryset, *extra):
+        """``queryset.values()`` with the serializer's columns plus ``extra``."""
+        return queryset.values(*dict.fromkeys([*self.columns, *extra]))
+
+    def build(self, row, plan):
+        data = {}
+        for name, column, convert in plan:
+            value = row[column]
+            if value is None or convert is None:
+                data[name] = value
+            elif isinstance(convert, list):
+                data[name] = self.build(row, convert)
+            else:
+                data[name] = convert(value)
+        return data
+
+    def serialize(self, rows):
+        plan = self.plan
+        rows = list(rows)
+        with timed_serialization():
+            return [self.build(row, plan) for row in rows]
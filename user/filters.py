@@ -1,11 +1,73 @@
 import django_filters
-from .models import Task
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ActivityLog, ActivityLogArchive, Task
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class ChoiceInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    pass
+
 
 class TaskFilter(django_filters.FilterSet):
-    status = django_filters.CharFilter(field_name='status', lookup_expr='iexact')
-    assigned_to = django_filters.NumberFilter(field_name='assigned_to__id')
+    """
+    Task list filters. Every filter compares a raw column with an index-friendly
+    lookup so that, combined with the team scope, it is served by one of the
+    partial ``task_live_*`` indexes on ``Task``.
+    """
+    status = django_filters.ChoiceFilter(choices=Task.STATUS_CHOICES)
+    status__in = ChoiceInFilter(field_name='status', choices=Task.STATUS_CHOICES)
+    assigned_to = django_filters.NumberFilter(field_name='assigned_to')
+    assigned_to__in = NumberInFilter(field_name='assigned_to')
+    team__in = NumberInFilter(field_name='team')
     due_date = django_filters.DateFilter(field_name='due_date')
+    due_before = django_filters.DateFilter(field_name='due_date', lookup_expr='lte')
+    due_after = django_filters.DateFilter(field_name='due_date', lookup_expr='gte')
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lte')
+    overdue = django_filters.BooleanFilter(method='filter_overdue')
 
     class Meta:
         model = Task
-        fields = ['status', 'assigned_to', 'due_date']
\ No newline at end of file
+        fields = [
+            'status', 'status__in', 'assigned_to', 'assigned_to__in', 'team__in',
+            'due_date', 'due_before', 'due_after', 'created_after', 'created_before', 'overdue',
+        ]
+
+    def filter_overdue(self, queryset, name, value):
+        overdue = Q(due_date__lt=timezone.localdate()) & ~Q(status='done')
+        return queryset.filter(overdue if value else ~overdue)
+
+
+class ActivityLogFilter(django_filters.FilterSet):
+    """
+    Activity feed filters. Combined with the ``team_id`` scope they are
+    served by ``activity_team_time_idx``, which also yields the feed's
+    timestamp order; single-task lookups can use ``activity_task_time_idx``.
+    """
+    task = django_filters.NumberFilter(field_name='task')
+    task__in = NumberInFilter(field_name='task')
+    action = django_filters.ChoiceFilter(choices=ActivityLog.ACTION_CHOICES)
+    action__in = ChoiceInFilter(field_name='action', choices=ActivityLog.ACTION_CHOICES)
+    team__in = NumberInFilter(field_name='team')
+    after = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    before = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lte')
+
+    class Meta:
+        model = ActivityLog
+        fields = ['task', 'task__in', 'action', 'action__in', 'team__in', 'after', 'before']
+
+
+class ActivityLogArchiveFilter(django_filters.FilterSet):
+    """Archives of the given teams whose time range overlaps ``[after, before]``."""
+    team__in = NumberInFilter(field_name='team')
+    after = django_filters.IsoDateTimeFilter(field_name='end', lookup_expr='gte')
+    before = django_filters.IsoDateTimeFilter(field_name='start', lookup_expr='lte')
+
+    class Meta:
+        model = ActivityLogArchive
+        fields = ['team__in', 'after', 'before']
@@ -0,0 +1,276 @@
+import codecs
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+
+from .activity import activity_entry, log_activity
+from .events import publish_task_events, task_event
+from .models import Task, TeamMembership, User
+from .roles import as_pk, invalidate_team_roles
+from .search import index_objects
+from .stats import apply_deltas, task_deltas
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # pragma: no cover
+    loads = json.loads
+
+FORMATS = ('csv', 'ndjson')
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(name, requested=None):
+    if requested:
+        return requested if requested in FORMATS else None
+    for extension, fmt in EXTENSIONS.items():
+        if (name or '').lower().endswith(extension):
+            return fmt
+    return None
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line, row)`` pairs from a binary stream one row at a time.
+    ``row`` is a dict, or a ``ValueError`` for a line that does not parse.
+    Blank CSV cells are dropped so they read as missing; reading stops at
+    the first CSV line that is not valid UTF-8.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+        try:
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+        except UnicodeDecodeError:
+            # The decoder cannot resume after a bad byte, so the rest of the file is lost.
+            yield reader.line_num + 1, ValueError('Not valid UTF-8; this and the following lines were skipped.')
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = loads(line)
+        except ValueError as exc:
+            yield number, ValueError(f'Invalid JSON: {exc}')
+            continue
+        yield number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+def read_upload(request, field='file'):
+    """Rows of the uploaded ``file``, in the format given by ``?input=`` or its extension."""
+    upload = request.FILES.get(field)
+    if upload is None:
+        raise ParseError(f'Upload a CSV or NDJSON file as "{field}".')
+    fmt = detect_format(upload.name, request.query_params.get('input'))
+    if fmt is None:
+        raise ParseError(f"Cannot tell the file format; pass input={'|'.join(FORMATS)}.")
+    return read_rows(upload, fmt)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def clean_field(model, name, value, errors):
+    """Run a model field's own conversion and validators; missing values take the field default."""
+    field = model._meta.get_field(name)
+    if value is None:
+        if not field.has_default() and not field.blank:
+            errors[name] = ['This field is required.']
+        return field.get_default()
+    try:
+        return field.clean(value, None)
+    except ValidationError as exc:
+        errors[name] = exc.messages
+    except (TypeError, ValueError):
+        errors[name] = [f'Invalid value {value!r}.']
+
+
+class ImportResult:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed) if elapsed else None,
+        }
+
+
+class Importer:
+    """
+    Streams rows through ``import_batch`` ``batch_size`` at a time. Each
+    batch is validated against ids resolved with one query per relation
+    and written in its own transaction; invalid rows are reported with
+    their line number and skipped without affecting the rest.
+    """
+    batch_size = 1000
+
+    def __init__(self, batch_size=None):
+        if batch_size:
+            self.batch_size = batch_size
+
+    def run(self, rows):
+        result = ImportResult()
+        for batch in batched(rows, self.batch_size):
+            result.rows += len(batch)
+            valid = []
+            for line, row in batch:
+                if isinstance(row, Exception):
+                    result.error(line, {'row': [str(row)]})
+                else:
+                    valid.append((line, row))
+            if valid:
+                self.import_batch(valid, result)
+        return result
+
+    def import_batch(self, batch, result):
+        raise NotImplementedError
+
+
+class TaskImporter(Importer):
+    """
+    Creates tasks in ``team_ids`` on behalf of ``user``. Columns: ``team``,
+    ``title``, ``description``, ``status``, ``due_date`` and
+    ``assigned_to``, which must be a member of the task's team. Stats,
+    search index, activity log and events are updated once per batch, as
+    ``BulkTaskProcessor`` does.
+    """
+
+    def __init__(self, user, team_ids, batch_size=None):
+        super().__init__(batch_size)
+        self.user = user
+        self.team_ids = set(team_ids)
+
+    def import_batch(self, batch, result):
+        pairs = {(as_pk(row.get('team')), as_pk(row.get('assigned_to'))) for _, row in batch if row.get('assigned_to')}
+        members = set(TeamMembership.objects.filter(
+            team_id__in={team for team, _ in pairs}, user_id__in={user for _, user in pairs},
+        ).values_list('team_id', 'user_id')) if pairs else set()
+
+        tasks = []
+        for line, row in batch:
+            task = self.build(row, members)
+            if isinstance(task, dict):
+                result.error(line, task)
+            else:
+                tasks.append(task)
+        if not tasks:
+            return
+        with transaction.atomic():
+            now = timezone.now()
+            for task in tasks:
+                task.created_at = task.updated_at = now
+            Task.objects.bulk_create(tasks)
+            for task in tasks:
+                task._loaded_values = task._snapshot()
+            apply_deltas(task_deltas(tasks, created=True))
+            index_objects(Task, tasks)
+            log_activity(activity_entry(task, 'created', f"Task '{task.title}' created") for task in tasks)
+            publish_task_events(task_event(task, 'created') for task in tasks)
+        result.created += len(tasks)
+
+    def build(self, row, members):
+        errors = {}
+        team_id = as_pk(row.get('team'))
+        if team_id not in self.team_ids:
+            errors['team'] = ['Unknown team, or you are not one of its admins.']
+        assigned_to_id = None
+        if row.get('assigned_to') is not None:
+            assigned_to_id = as_pk(row['assigned_to'])
+            if (team_id, assigned_to_id) not in members:
+                errors['assigned_to'] = ['User not a member of the team.']
+        values = {
+            name: clean_field(Task, name, row.get(name), errors)
+            for name in ('title', 'description', 'status', 'due_date')
+        }
+        if errors:
+            return errors
+        return Task(team_id=team_id, assigned_to_id=assigned_to_id, created_by=self.user, **values)
+
+
+class MembershipImporter(Importer):
+    """
+    Adds users to ``team``. Each row names the user by ``user`` (id),
+    ``username`` or ``email`` and may give a ``role``; existing members get
+    the new role.
+    """
+
+    def __init__(self, team, batch_size=None):
+        super().__init__(batch_size)
+        self.team = team
+
+    def import_batch(self, batch, result):
+        ids = {as_pk(row['user']) for _, row in batch if row.get('user') is not None}
+        usernames = {str(row['username']) for _, row in batch if row.get('username')}
+        emails = {str(row['email']) for _, row in batch if row.get('email')}
+        users = {}
+        for pk, username, email in User.objects.filter(
+            Q(pk__in=ids) | Q(username__in=usernames) | Q(email__in=emails)
+        ).values_list('pk', 'username', 'email'):
+            users[('user', pk)] = users[('username', username)] = users[('email', email)] = pk
+
+        roles = {}
+        for line, row in batch:
+            errors = {}
+            user_id = self.resolve(row, users)
+            if user_id is None:
+                errors['user'] = ['Unknown user.']
+            role = clean_field(TeamMembership, 'role', row.get('role'), errors)
+            if errors:
+                result.error(line, errors)
+            else:
+                roles[user_id] = role
+        if not roles:
+            return
+
+        with transaction.atomic():
+            existing = {
+                membership.user_id: membership
+                for membership in TeamMembership.objects.filter(team=self.team, user_id__in=roles).only('id', 'user_id', 'role')
+            }
+            changed = [m for user_id, m in existing.items() if m.role != roles[user_id]]
+            for membership in changed:
+                membership.role = roles[membership.user_id]
+            TeamMembership.objects.bulk_update(changed, ['role'])
+            TeamMembership.objects.bulk_create(
+                TeamMembership(team=self.team, user_id=user_id, role=role)
+                for user_id, role in roles.items() if user_id not in existing
+            )
+            invalidate_team_roles(roles)
+        result.created += len(roles) - len(existing)
+        result.updated += len(changed)
+
+    def resolve(self, row, users):
+        if row.get('user') is not None:
+            return users.get(('user', as_pk(row['user'])))
+        for key in ('username', 'email'):
+            if row.get(key):
+                return users.get((key, str(row[key])))
+        return None
@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from user.models import User, Company, Team, TeamMembership, Task
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run a benchmark inside a transaction that is always discarded."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def seed(tasks, teams, members_per_team=5, users=None, batch_size=5000):
+    """
+    Bulk-insert a synthetic tenant: one company, ``teams`` teams, a shared
+    user pool and ``tasks`` tasks spread round-robin over the teams.
+    Signals are bypassed, so no activity rows are written.
+    """
+    users = users or max(teams, members_per_team)
+    owner = User.objects.create(username='bench-owner', email='bench-owner@example.com')
+    pool = User.objects.bulk_create(
+        [User(username=f'bench-{i}', email=f'bench-{i}@example.com') for i in range(users)],
+        batch_size=batch_size,
+    )
+    company = Company.objects.create(name='Bench', owner=owner)
+    team_objs = Team.objects.bulk_create(
+        [Team(company=company, name=f'Team {i}') for i in range(teams)], batch_size=batch_size
+    )
+    TeamMembership.objects.bulk_create(
+        [
+            TeamMembership(team=team, user=pool[(t + m) % users], role='admin' if m == 0 else 'member')
+            for t, team in enumerate(team_objs)
+            for m in range(min(members_per_team, users))
+        ],
+        batch_size=batch_size,
+    )
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    Task.objects.bulk_create(
+        (
+            Task(
+                team=team_objs[i % teams],
+                title=f'Task {i}',
+                description=f'Benchmark task number {i} ' * 4,
+                created_by=owner,
+                assigned_to=pool[i % users],
+                status=statuses[i % len(statuses)],
+                is_deleted=i % 50 == 0,
+            )
+            for i in range(tasks)
+        ),
+        batch_size=batch_size,
+    )
+    return pool
+
+
+def timeit(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
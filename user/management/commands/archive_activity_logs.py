@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user.models import ActivityLog
+from user.retention import Archiver, expired, retention_settings
+
+
+class Command(BaseCommand):
+    help = 'Move activity logs past their retention period into gzip NDJSON archives and daily rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention for actions without an override.')
+        parser.add_argument(
+            '--action-days', action='append', default=[], metavar='ACTION=DAYS',
+            help="Per-action retention, e.g. updated=30; 'none' keeps the action forever.",
+        )
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        actions = {}
+        valid = {action for action, _ in ActivityLog.ACTION_CHOICES}
+        for value in options['action_days']:
+            action, _, days = value.partition('=')
+            if action not in valid or not (days.isdigit() or days == 'none'):
+                raise CommandError(f'Invalid --action-days {value!r}.')
+            actions[action] = None if days == 'none' else int(days)
+        archiver = Archiver(
+            expired(days=options['days'], actions=actions),
+            batch_size=options['batch_size'] or retention_settings()['BATCH_SIZE'],
+            pause=options['pause'],
+        )
+        if options['dry_run']:
+            for action, count in sorted(archiver.pending().items()):
+                self.stdout.write(f'{action:<10} {count} rows to archive')
+            return
+        archived = archiver.run()
+        for team_id, count in sorted(archived.items()):
+            self.stdout.write(f'team {team_id}: {count} rows archived')
+        self.stdout.write(self.style.SUCCESS(f'Archived {sum(archived.values())} rows.'))
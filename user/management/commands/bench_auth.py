@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.authentication import CachedJWTAuthentication
+from user.views import TaskViewSet
+from ._bench import rolled_back, seed
+
+VARIANTS = [
+    ('jwt', JWTAuthentication, False),
+    ('cached', CachedJWTAuthentication, False),
+    ('stateless', CachedJWTAuthentication, True),
+]
+
+
+class Command(BaseCommand):
+    help = 'Queries and time per authenticated task-list request for each JWT authentication mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--path', default='/api/tasks/?page_size=10')
+
+    def handle(self, *args, **options):
+        with rolled_back(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user = seed(500, 10)[0]
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            original = TaskViewSet.authentication_classes
+            baseline = None
+            try:
+                for name, backend, stateless in VARIANTS:
+                    TaskViewSet.authentication_classes = [backend]
+                    with override_settings(JWT_AUTH_CACHE={'STATELESS_READS': stateless}):
+                        queries, elapsed = self.measure(client, options['path'], options['requests'])
+                    baseline = queries if baseline is None else baseline
+                    self.stdout.write(
+                        f'{name:<10} queries/request={queries:5.2f} saved={baseline - queries:5.2f} '
+                        f'ms/request={elapsed * 1000:7.3f}'
+                    )
+            finally:
+                TaskViewSet.authentication_classes = original
+
+    def measure(self, client, path, requests):
+        cache.clear()
+        client.get(path)  # warm the token, user and role caches
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(requests):
+                response = client.get(path)
+                assert response.status_code == 200, response.content
+            elapsed = time.perf_counter() - start
+        return len(ctx.captured_queries) / requests, elapsed / requests
@@ -0,0 +1,59 @@
+import io
+import json
+from datetime import date
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+
+from user.activity import get_writer
+from user.importers import TaskImporter, read_rows
+from user.models import Task, TeamMembership
+from ._bench import rolled_back, seed, timeit
+
+
+class Command(BaseCommand):
+    help = 'Rows/sec of one Task.objects.create() per row versus the batched task importer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--teams', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Write activity rows inline so both paths pay for them inside the benchmark.
+        writer = get_writer()
+        asynchronous, writer.asynchronous = writer.asynchronous, False
+        try:
+            with rolled_back():
+                pool = seed(0, options['teams'], members_per_team=5)
+                user = pool[0]
+                memberships = list(TeamMembership.objects.filter(team__in=TeamMembership.objects.filter(
+                    user=user, role='admin').values('team')).values_list('team_id', 'user_id'))
+                rows = [
+                    {'team': team, 'title': f'Imported {i}', 'description': f'Row {i}',
+                     'assigned_to': assignee, 'status': 'todo', 'due_date': '2030-01-01'}
+                    for i, (team, assignee) in zip(range(options['rows']), cycle(memberships))
+                ]
+                body = b'\n'.join(json.dumps(row).encode() for row in rows)
+                team_ids = {team for team, _ in memberships}
+
+                def one_by_one():
+                    for row in rows:
+                        Task.objects.create(
+                            team_id=row['team'], title=row['title'], description=row['description'],
+                            assigned_to_id=row['assigned_to'], status=row['status'], due_date=date.fromisoformat(row['due_date']),
+                            created_by=user,
+                        )
+
+                def batched():
+                    result = TaskImporter(user, team_ids, options['batch_size']).run(read_rows(io.BytesIO(body), 'ndjson'))
+                    assert result.created == len(rows), result.errors[:5]
+
+                slow = timeit(one_by_one, 1)
+                fast = timeit(batched, 1)
+                self.stdout.write(
+                    f'rows={len(rows)} create()={len(rows) / slow:>8.0f} rows/s '
+                    f'importer={len(rows) / fast:>8.0f} rows/s speedup={slow / fast:5.2f}x'
+                )
+        finally:
+            writer.asynchronous = asynchronous
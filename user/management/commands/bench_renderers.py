@@ -0,0 +1,52 @@
+import io
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from user.models import Task
+from user.renderers import ORJSONParser, ORJSONRenderer
+from user.serializers import TaskSerializer
+from ._bench import rolled_back, seed, timeit
+
+
+def peak_allocated(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Compare render/parse time and peak allocations of the stdlib and orjson JSON paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, action='append', dest='sizes',
+                            help='Task page size to render (repeatable, default: 100 and 1000).')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or [100, 1000]
+        with rolled_back():
+            seed(max(sizes), 10)
+            tasks = list(Task.objects.select_related('created_by', 'assigned_to').order_by('-id')[:max(sizes)])
+            for size in sizes:
+                data = {'next': None, 'previous': None, 'results': TaskSerializer(tasks[:size], many=True).data}
+                body = JSONRenderer().render(data)
+                self.stdout.write(f'{size} tasks, {len(body)} bytes')
+                self.report('render', JSONRenderer().render, ORJSONRenderer().render, data, options)
+                self.report(
+                    'parse',
+                    lambda body: JSONParser().parse(io.BytesIO(body)),
+                    lambda body: ORJSONParser().parse(io.BytesIO(body)),
+                    body, options,
+                )
+
+    def report(self, label, stdlib, fast, arg, options):
+        for name, func in (('stdlib', stdlib), ('orjson', fast)):
+            elapsed = timeit(lambda: func(arg), options['repeat'])
+            peak = peak_allocated(lambda: func(arg))
+            self.stdout.write(f'  {label:<7}{name:<8} {elapsed * 1000:8.3f} ms  peak={peak / 1024:9.1f} KiB')
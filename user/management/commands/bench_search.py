@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from user.models import Task
+from user.search import get_backend
+from ._bench import rolled_back, seed, timeit
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains search with the full-text index on a seeded dataset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000)
+        parser.add_argument('--teams', type=int, default=1_000)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--term', action='append', dest='terms',
+                            help='Search term to time (repeatable, default: a selective and a broad term).')
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of each variant.')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not backend.available:
+            raise CommandError(f'{type(backend).__name__} has no full-text index to benchmark.')
+        terms = options['terms'] or [str(options['tasks'] // 2 + 7), 'benchmark']
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['tasks']} tasks across {options['teams']} teams...")
+            seed(options['tasks'], options['teams'])
+            backend.rebuild(Task)
+            base = Task.objects.filter(is_deleted=False)
+            for term in terms:
+                like = base.filter(Q(title__icontains=term) | Q(description__icontains=term)).order_by('-id')
+                ranked = backend.search(base, [term]).order_by(backend.rank_ordering, 'id')
+                self.report(f'{term}/icontains', like, options)
+                self.report(f'{term}/fulltext', ranked, options)
+
+    def report(self, label, queryset, options):
+        size = options['page_size']
+        count_time = timeit(lambda: queryset.count(), options['repeat'])
+        page_time = timeit(lambda: list(queryset[:size]), options['repeat'])
+        self.stdout.write(
+            f'{label:<26} count={queryset.count():>7} '
+            f'count_ms={count_time * 1000:8.2f} page_ms={page_time * 1000:8.2f}'
+        )
+        if options['explain']:
+            self.stdout.write(queryset[:size].explain())
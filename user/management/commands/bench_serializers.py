@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from user.fastpath import RowSerializer
+from user.models import ActivityLog, Task, TeamMembership
+from user.serializers import ActivityLogSerializer, TaskSerializer, TeamMemberSerializer
+from ._bench import rolled_back, seed, timeit
+
+
+class Command(BaseCommand):
+    help = 'Rows/sec of the ModelSerializer and values() fast paths for list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10_000)
+        parser.add_argument('--teams', type=int, default=10)
+        parser.add_argument('--members-per-team', type=int, default=100)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        size = options['page_size']
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['tasks']} tasks across {options['teams']} teams...")
+            pool = seed(options['tasks'], options['teams'], options['members_per_team'])
+            tasks = Task.objects.order_by('-id')[:size]
+            ActivityLog.objects.bulk_create(
+                ActivityLog(task=task, team_id=task.team_id, user=pool[i % len(pool)], action='updated', note=f'Change {i}')
+                for i, task in enumerate(tasks)
+            )
+            team = TeamMembership.objects.filter(user=pool[0]).values_list('team', flat=True).first()
+            cases = [
+                ('tasks', TaskSerializer, Task.objects.filter(is_deleted=False).select_related(
+                    'created_by', 'assigned_to').order_by('-created_at', '-id')),
+                ('activity-logs', ActivityLogSerializer,
+                 ActivityLog.objects.select_related('user').order_by('-timestamp', '-id')),
+                ('team-members', TeamMemberSerializer,
+                 TeamMembership.objects.filter(team=team).select_related('user').order_by('id')),
+            ]
+            for name, serializer_class, queryset in cases:
+                rows = RowSerializer(serializer_class())
+                slow = timeit(lambda: serializer_class(list(queryset[:size]), many=True).data, options['repeat'])
+                fast = timeit(lambda: rows.serialize(rows.values(queryset)[:size]), options['repeat'])
+                count = len(queryset[:size])
+                self.stdout.write(
+                    f'{name:<14} rows={count:>4} serializer={count / slow:>10.0f} rows/s '
+                    f'values={count / fast:>10.0f} rows/s speedup={slow / fast:5.2f}x'
+                )
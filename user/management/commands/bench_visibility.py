@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from user.models import Task, Team, Company
+from ._bench import rolled_back, seed, timeit
+
+
+class Command(BaseCommand):
+    help = 'Compare the DISTINCT-join and EXISTS/subquery visibility plans on a seeded dataset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100_000)
+        parser.add_argument('--teams', type=int, default=1_000)
+        parser.add_argument('--members-per-team', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of each variant.')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['tasks']} tasks across {options['teams']} teams...")
+            pool = seed(options['tasks'], options['teams'], options['members_per_team'])
+            user = pool[0]
+            plans = {
+                'tasks': (
+                    Task.objects.filter(is_deleted=False).filter(team__memberships__user=user).distinct(),
+                    Task.objects.visible_to(user).filter(is_deleted=False),
+                ),
+                'teams': (
+                    Team.objects.filter(company__owner=user) | Team.objects.filter(memberships__user=user),
+                    Team.objects.visible_to(user),
+                ),
+                'companies': (
+                    Company.objects.filter(owner=user) | Company.objects.filter(teams__memberships__user=user),
+                    Company.objects.visible_to(user),
+                ),
+            }
+            for name, (legacy, scoped) in plans.items():
+                legacy = legacy.distinct().order_by('-pk')
+                scoped = scoped.order_by('-pk')
+                self.report(f'{name}/distinct-join', legacy, options)
+                self.report(f'{name}/exists', scoped, options)
+
+    def report(self, label, queryset, options):
+        size = options['page_size']
+        count_time = timeit(lambda: queryset.count(), options['repeat'])
+        page_time = timeit(lambda: list(queryset[:size]), options['repeat'])
+        self.stdout.write(
+            f'{label:<26} count={queryset.count():>7} '
+            f'count_ms={count_time * 1000:8.2f} page_ms={page_time * 1000:8.2f}'
+        )
+        if options['explain']:
+            self.stdout.write(queryset[:size].explain())
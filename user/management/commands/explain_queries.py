@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from user.models import User, Team, TeamMembership
+from user.views import CompanyViewSet, TeamViewSet, TaskViewSet, ActivityLogViewSet, ProfileViewSet
+
+
+VIEWSETS = {
+    'profile-list': ProfileViewSet,
+    'company-list': CompanyViewSet,
+    'team-list': TeamViewSet,
+    'task-list': TaskViewSet,
+    'activity-log-list': ActivityLogViewSet,
+}
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the SQL each viewset generates, to check index usage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username or id to scope the querysets to (default: first user).')
+        parser.add_argument('--view', action='append', choices=sorted(VIEWSETS) + ['team-members'],
+                            help='Only explain these views (repeatable).')
+        parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                            help='Query parameter passed to the filter backends, e.g. status=todo.')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (PostgreSQL only).')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        params = dict(self.split_param(p) for p in options['param'])
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        names = options['view'] or list(VIEWSETS) + ['team-members']
+
+        for name in names:
+            if name == 'team-members':
+                team = Team.objects.visible_to(user).first()
+                if team is None:
+                    continue
+                queryset = TeamMembership.objects.filter(team=team).select_related('user')
+            else:
+                queryset = self.build_queryset(VIEWSETS[name], user, params)
+            queryset = queryset[:options['page_size']]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
+
+    def get_user(self, value):
+        if value is None:
+            user = User.objects.order_by('pk').first()
+        else:
+            lookup = {'pk': value} if value.isdigit() else {'username': value}
+            user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError('No matching user; pass --user or create one first.')
+        return user
+
+    def split_param(self, value):
+        if '=' not in value:
+            raise CommandError(f'Invalid --param {value!r}, expected KEY=VALUE.')
+        return value.split('=', 1)
+
+    def build_queryset(self, viewset, user, params):
+        view = viewset(action_map={'get': 'list'}, format_kwarg=None, kwargs={}, args=())
+        view.request = view.initialize_request(APIRequestFactory().get('/', params))
+        view.request.user = user
+        return view.filter_queryset(view.get_queryset())
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user.importers import FORMATS, MembershipImporter, TaskImporter, detect_format, read_rows
+from user.models import Team, TeamMembership, User
+
+
+class Command(BaseCommand):
+    help = 'Import tasks or team members from a CSV or NDJSON file in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=('tasks', 'members'))
+        parser.add_argument('path')
+        parser.add_argument('--user', help='Username creating the tasks; must be an admin of their teams.')
+        parser.add_argument('--team', type=int, help='Team receiving the members.')
+        parser.add_argument('--input', choices=FORMATS, help='File format; taken from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--show-errors', type=int, default=20)
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['input'])
+        if fmt is None:
+            raise CommandError(f"Cannot tell the file format; pass --input {'|'.join(FORMATS)}.")
+        importer = self.importer(options)
+        with open(options['path'], 'rb') as stream:
+            result = importer.run(read_rows(stream, fmt)).as_dict()
+        for error in result['errors'][:options['show_errors']]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            f"{result['rows']} rows in {result['seconds']:.2f}s ({result['rows_per_second']} rows/s): "
+            f"{result['created']} created, {result['updated']} updated, {result['failed']} failed"
+        )
+
+    def importer(self, options):
+        if options['kind'] == 'tasks':
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError('--user must name an existing user.')
+            team_ids = TeamMembership.objects.filter(user=user, role='admin').values_list('team_id', flat=True)
+            return TaskImporter(user, team_ids, options['batch_size'])
+        team = Team.objects.filter(pk=options['team']).first()
+        if team is None:
+            raise CommandError('--team must name an existing team.')
+        return MembershipImporter(team, options['batch_size'])
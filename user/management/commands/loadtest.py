@@ -0,0 +1,108 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+ENDPOINTS = {
+    'task-list': ('/api/tasks/', '/api/async/tasks/'),
+    'activity-log-list': ('/api/activity-logs/', '/api/async/activity-logs/'),
+    'profile-me': ('/api/profile/me/', '/api/async/profile/me/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync and async read endpoints of a running server at high connection counts. '
+        'Start the server under ASGI first, e.g. `uvicorn main.asgi:application`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--token', help='JWT access token; obtained from /api/token/ when omitted.')
+        parser.add_argument('--username')
+        parser.add_argument('--password')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Endpoints to test (repeatable, default: all).')
+        parser.add_argument('--concurrency', type=int, default=200, help='Simultaneous open connections.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode.')
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['base_url'])
+        if url.scheme != 'http':
+            raise CommandError('Only plain http:// targets are supported.')
+        self.host, self.port = url.hostname, url.port or 80
+        self.timeout = options['timeout']
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        token = options['token'] or await self.obtain_token(options['username'], options['password'])
+        headers = {'Authorization': f'Bearer {token}'}
+        self.stdout.write(f"{'endpoint':<20}{'mode':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for name in options['endpoint'] or sorted(ENDPOINTS):
+            for mode, path in zip(('sync', 'async'), ENDPOINTS[name]):
+                latencies, errors, elapsed = await self.hammer(
+                    path, headers, options['concurrency'], options['requests']
+                )
+                self.report(name, mode, latencies, errors, elapsed)
+
+    async def obtain_token(self, username, password):
+        if not username or not password:
+            raise CommandError('Pass --token or --username/--password.')
+        body = json.dumps({'username': username, 'password': password}).encode()
+        status, payload = await self.request(
+            'POST', '/api/token/', {'Content-Type': 'application/json'}, body
+        )
+        if status != 200:
+            raise CommandError(f'Could not obtain a token (HTTP {status}).')
+        return json.loads(payload.split(b'\r\n\r\n', 1)[1])['access']
+
+    async def hammer(self, path, headers, concurrency, total):
+        latencies, errors = [], 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    status, _ = await self.request('GET', path, headers)
+                except (OSError, asyncio.TimeoutError):
+                    status = None
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+    async def request(self, method, path, headers, body=b''):
+        async def send():
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: close',
+                     f'Content-Length: {len(body)}']
+            lines += [f'{key}: {value}' for key, value in headers.items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+            await writer.drain()
+            payload = await reader.read()
+            writer.close()
+            status = int(payload.split(b' ', 2)[1]) if payload else None
+            return status, payload
+
+        return await asyncio.wait_for(send(), self.timeout)
+
+    def report(self, name, mode, latencies, errors, elapsed):
+        if latencies:
+            ordered = sorted(latencies)
+            p95 = ordered[int(len(ordered) * 0.95) - 1] * 1000
+            p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+            p50 = statistics.median(ordered) * 1000
+        else:
+            p50 = p95 = p99 = 0.0
+        rate = len(latencies) / elapsed if elapsed else 0.0
+        self.stdout.write(f'{name:<20}{mode:<7}{rate:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{errors:>8}')
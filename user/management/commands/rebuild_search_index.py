@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from user.search import INDEXES, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the full-text search index from the task and user tables.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not backend.available:
+            raise CommandError(f'{type(backend).__name__} has no full-text index to rebuild.')
+        with transaction.atomic():
+            for model in INDEXES:
+                backend.rebuild(model)
+                self.stdout.write(f'Rebuilt {model._meta.label} index.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
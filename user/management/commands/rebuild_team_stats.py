@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the TeamTaskStats and TeamTaskDueStats buckets from the task table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', type=int, action='append', dest='teams',
+                            help='Only rebuild this team (repeatable, default: all teams).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            buckets = stats.rebuild(options['teams'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} bucket(s).'))
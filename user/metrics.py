@@ -0,0 +1,258 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .events import get_broker
+from .roles import cache_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Wall time per request.', DURATION_BUCKETS),
+    'http_request_db_queries': ('SQL statements per request.', COUNT_BUCKETS),
+    'http_request_db_duration_seconds': ('Time spent in SQL per request.', DURATION_BUCKETS),
+    'http_request_serializer_duration_seconds': ('Time spent serializing per request.', DURATION_BUCKETS),
+    'http_response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+}
+
+
+def metrics_settings():
+    return {'ENABLED': True, 'SLOW_REQUEST_MS': None, 'MAX_CAPTURED_QUERIES': 50,
+            'ALLOWED_IPS': ('127.0.0.1', '::1'), **getattr(settings, 'METRICS', {})}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms keyed by metric name and ``(route, method)`` labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, labels, values):
+        with self._lock:
+            for name, value in values.items():
+                key = (name, labels)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self.histograms.items())
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (metric, (route, method)), histogram in items:
+                    if metric != name:
+                        continue
+                    labels = f'route="{route}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    __slots__ = (
+        'queries', 'db_time', 'serializer_time', 'serializing', 'captured', 'capture_limit', 'slow_ms', 'started',
+    )
+
+    def __init__(self, slow_ms=None, capture_limit=0):
+        self.slow_ms = slow_ms
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.captured = []
+        self.capture_limit = capture_limit
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            if len(self.captured) < self.capture_limit:
+                self.captured.append((elapsed, sql))
+
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(connection):
+    """
+    Add ``record_query`` to the connection's execute wrappers for good. The
+    request being measured is found through a context variable, which
+    asgiref carries into ``sync_to_async`` threads, so async views that run
+    their queries on other threads' connections are measured too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """Add the enclosed time to the current request's serializer time; nested calls count once."""
+    metrics = current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.serializing = False
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else 'unmatched'
+
+
+def response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, SQL count and time, serializer time and response size
+    per route name, and log slow requests with their SQL when
+    ``METRICS['SLOW_REQUEST_MS']`` is set. Works in both sync and async
+    stacks; SQL is measured by the execute wrapper ``install()`` adds.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.start()
+        if metrics is None:
+            return self.get_response(request)
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        if metrics is None:
+            return await self.get_response(request)
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return None
+        slow_ms = config['SLOW_REQUEST_MS']
+        return RequestMetrics(slow_ms, config['MAX_CAPTURED_QUERIES'] if slow_ms is not None else 0)
+
+    def finish(self, request, response, metrics):
+        elapsed = time.perf_counter() - metrics.started
+        route = route_name(request)
+        values = {
+            'http_request_duration_seconds': elapsed,
+            'http_request_db_queries': metrics.queries,
+            'http_request_db_duration_seconds': metrics.db_time,
+            'http_request_serializer_duration_seconds': metrics.serializer_time,
+        }
+        size = response_size(response)
+        if size is not None:
+            values['http_response_size_bytes'] = size
+        registry.observe((route, request.method), values)
+        if metrics.slow_ms is not None and elapsed * 1000 >= metrics.slow_ms:
+            self.log_slow(request, route, elapsed, metrics)
+        return response
+
+    def log_slow(self, request, route, elapsed, metrics):
+        queries = '\n'.join(f'  {duration * 1000:8.2f} ms  {sql}' for duration, sql in metrics.captured)
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, serializer %.1f ms\n%s',
+            request.method, request.get_full_path(), route, elapsed * 1000,
+            metrics.queries, metrics.db_time * 1000, metrics.serializer_time * 1000, queries,
+        )
+
+
+def gauge(name, help_text, value, kind='gauge'):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the request histograms and cache/broker stats."""
+    if request.META.get('REMOTE_ADDR') not in metrics_settings()['ALLOWED_IPS']:
+        return HttpResponseForbidden()
+    lines = registry.render()
+    roles = cache_stats.as_dict()
+    lines += gauge('team_role_cache_hits_total', 'Team role cache hits.', roles['hits'], 'counter')
+    lines += gauge('team_role_cache_misses_total', 'Team role cache misses.', roles['misses'], 'counter')
+    broker = get_broker().stats()
+    lines += gauge('event_broker_subscribers', 'Open event stream subscriptions.', broker['subscribers'])
+    lines += gauge('event_broker_queued_events', 'Events waiting in subscriber queues.', broker['queued'])
+    lines += gauge('event_broker_published_total', 'Events published.', broker['published'], 'counter')
+    lines += gauge('event_broker_dropped_total', 'Events dropped from full queues.', broker['dropped'], 'counter')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_activitylog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['team', 'updated_at', 'id'], name='task_team_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_tasks(apps, schema_editor):
+    """Fill the buckets from the existing tasks."""
+    Task = apps.get_model('user', 'Task')
+    TeamTaskStats = apps.get_model('user', 'TeamTaskStats')
+    TeamTaskDueStats = apps.get_model('user', 'TeamTaskDueStats')
+    tasks = Task.objects.filter(is_deleted=False)
+    rows = tasks.values('team_id', 'status', 'assigned_to_id').annotate(n=Count('id'))
+    TeamTaskStats.objects.bulk_create(
+        TeamTaskStats(team_id=row['team_id'], status=row['status'], assigned_to_id=row['assigned_to_id'], count=row['n'])
+        for row in rows.order_by()
+    )
+    rows = tasks.exclude(status='done').filter(due_date__isnull=False).values('team_id', 'due_date').annotate(n=Count('id'))
+    TeamTaskDueStats.objects.bulk_create(
+        TeamTaskDueStats(team_id=row['team_id'], due_date=row['due_date'], count=row['n'])
+        for row in rows.order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_team_company_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamTaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('done', 'Done')], max_length=32)),
+                ('count', models.IntegerField(default=0)),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='user.team')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('assigned_to__isnull', False)), fields=('team', 'status', 'assigned_to'), name='team_stats_assigned_uniq'),
+                    models.UniqueConstraint(condition=models.Q(('assigned_to__isnull', True)), fields=('team', 'status'), name='team_stats_unassigned_uniq'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamTaskDueStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_due_stats', to='user.team')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('team', 'due_date'), name='team_due_stats_uniq')],
+            },
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
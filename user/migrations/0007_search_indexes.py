@@ -0,0 +1,53 @@
+from django.db import OperationalError, migrations
+
+# base table -> (index name, indexed columns). Kept in sync with user.search.INDEXES
+# by hand so that later changes to the app code cannot break this migration.
+INDEXES = {
+    'user_task': ('user_task_fts', ('title', 'description')),
+    'user_user': ('user_user_fts', ('username', 'email', 'first_name', 'last_name')),
+}
+
+
+def postgres_document(base, columns):
+    values = " || ' ' || ".join(f'coalesce("{base}"."{column}", \'\')' for column in columns)
+    return f"to_tsvector('simple', {values})"
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for base, (table, columns) in INDEXES.items():
+        if vendor == 'sqlite':
+            try:
+                schema_editor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({', '.join(columns)}, prefix='2 3')"
+                )
+            except OperationalError:
+                # SQLite built without FTS5: search keeps using icontains lookups.
+                return
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(columns)}) SELECT id, {', '.join(columns)} FROM {base}"
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_gin ON {base} USING GIN (({postgres_document(base, columns)}))'
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for base, (table, columns) in INDEXES.items():
+        if vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_team_task_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
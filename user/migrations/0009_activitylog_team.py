@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_task_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='team',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_logs', to='user.team'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_team(apps, schema_editor):
+    """Copy each log's task team in id-ordered batches, each committed on its own."""
+    ActivityLog = apps.get_model('user', 'ActivityLog')
+    Task = apps.get_model('user', 'Task')
+    team = Subquery(Task.objects.filter(pk=OuterRef('task_id')).values('team_id')[:1])
+    last = 0
+    while True:
+        ids = list(
+            ActivityLog.objects.filter(id__gt=last, team__isnull=True).order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        ActivityLog.objects.filter(id__in=ids).update(team_id=team)
+        last = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('user', '0009_activitylog_team'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_team, migrations.RunPython.noop),
+    ]
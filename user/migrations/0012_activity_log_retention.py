@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0011_activitylog_team_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('file', models.FileField(upload_to='activity-archive/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_archives', to='user.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['team', 'start'], name='activity_archive_team_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('assigned', 'Assigned'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='user.team')),
+            ],
+            options={
+                'unique_together': {('team', 'day', 'action')},
+            },
+        ),
+    ]
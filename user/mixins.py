@@ -0,0 +1,238 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .fastpath import RowSerializer, Unsupported
+from .models import User
+from .serializers import UserProfileSerializer, split_param
+
+USER_PROFILE_FIELDS = UserProfileSerializer.Meta.fields
+
+
+def related_columns(relation, fields=USER_PROFILE_FIELDS):
+    return tuple(f'{relation}__{field}' for field in fields)
+
+
+class OptimizedQuerysetMixin:
+    """
+    Viewsets declare the relations their serializer walks so that list and
+    detail querysets are fetched with a fixed number of queries.
+
+    ``select_related_fields`` maps a forward relation to the columns the
+    nested serializer reads, ``only_fields`` lists the model's own columns
+    and ``prefetch_related_fields`` is passed through as is.
+    """
+    select_related_fields = {}
+    prefetch_related_fields = ()
+    only_fields = ()
+
+    def get_select_related_fields(self):
+        return self.select_related_fields
+
+    def get_only_fields(self):
+        return self.only_fields
+
+    def optimize_queryset(self, queryset):
+        select_related = self.get_select_related_fields()
+        only_fields = self.get_only_fields()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        if only_fields:
+            columns = list(only_fields)
+            for relation, fields in select_related.items():
+                columns.extend(related_columns(relation, fields))
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+class CompactListMixin(OptimizedQuerysetMixin):
+    """
+    Compact list responses.
+
+    ``?fields=a,b`` limits each row to those fields and only loads their
+    columns. User relations named in the serializer's ``expandable_fields``
+    are rendered as ids and each distinct user is serialized once, in a
+    ``users`` map next to ``results``; ``?expand=created_by`` nests that
+    relation inline instead. Other actions keep the full representation.
+
+    Lists are read through ``RowSerializer`` when the serializer allows it;
+    set ``row_serializer = False`` to always go through the serializer.
+    """
+    fields_param = 'fields'
+    expand_param = 'expand'
+    row_serializer = True
+
+    @property
+    def compact(self):
+        return self.action == 'list'
+
+    def requested_fields(self):
+        return split_param(self.request.query_params.get(self.fields_param)) if self.compact else set()
+
+    def expanded_fields(self):
+        return split_param(self.request.query_params.get(self.expand_param)) if self.compact else None
+
+    def side_loaded_fields(self):
+        expand = self.expanded_fields()
+        if expand is None:
+            return ()
+        requested = self.requested_fields()
+        return [
+            name for name in self.get_serializer_class().expandable_fields
+            if name not in expand and (not requested or name in requested)
+        ]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.compact:
+            context['fields'] = self.requested_fields()
+            context['expand'] = self.expanded_fields()
+        return context
+
+    def get_select_related_fields(self):
+        expand = self.expanded_fields()
+        requested = self.requested_fields()
+        return {
+            relation: fields for relation, fields in self.select_related_fields.items()
+            if (expand is None or relation in expand) and (not requested or relation in requested)
+        }
+
+    def get_only_fields(self):
+        requested = self.requested_fields()
+        if not requested:
+            return self.only_fields
+        # Columns the paginator and ordering filter read from each row.
+        ordering = [name.lstrip('-') for name in getattr(self.paginator, 'ordering', None) or ()]
+        required = {'id', *ordering, *getattr(self, 'ordering_fields', ())}
+        return tuple(name for name in self.only_fields if name in requested or name in required)
+
+    def get_row_serializer(self):
+        """The ``values()`` fast path for this list, or None to use the serializer."""
+        if not self.compact or not self.row_serializer:
+            return None
+        try:
+            return RowSerializer(self.get_serializer())
+        except Unsupported:
+            return None
+
+    def list_queryset(self, rows):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Columns the paginator orders by, whether set by a filter or its default.
+        ordering = [name for name in queryset.query.order_by if isinstance(name, str)]
+        ordering += getattr(self.paginator, 'ordering', None) or ()
+        return rows.values(queryset, 'id', *(name.lstrip('-') for name in ordering))
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.list_queryset(rows)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(rows.serialize(queryset))
+        return self.get_paginated_response(rows.serialize(page))
+
+    def side_load_users(self, rows):
+        names = self.side_loaded_fields()
+        ids = {row[name] for row in rows for name in names if row.get(name) is not None}
+        users = User.objects.filter(pk__in=ids).only(*USER_PROFILE_FIELDS).order_by('pk') if ids else ()
+        return {user.pk: UserProfileSerializer(user).data for user in users}
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.side_loaded_fields():
+            response.data['users'] = self.side_load_users(data)
+        return response
+
+
+def detail_etag(obj, field='updated_at'):
+    value = getattr(obj, field)
+    return quote_etag(f'{obj.pk}-{int(value.timestamp() * 1_000_000)}')
+
+
+def digest_etag(*parts):
+    return 'W/' + quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag is not None:
+        response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """
+    Evaluate the request's preconditions against the given validators and
+    return a 304/412 response when they short-circuit the request.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalResponseMixin:
+    """
+    ETag and Last-Modified support for model viewsets whose model has an
+    ``updated_at`` column.
+
+    List ETags come from ``MAX(updated_at)`` and ``COUNT(*)`` over the
+    filtered queryset. Lists carry no Last-Modified, since a deleted or
+    hidden row removes itself without raising ``MAX(updated_at)``. Detail
+    validators come from the row's pk and ``updated_at``. Both are checked
+    before any serializer runs, so ``If-None-Match`` (and
+    ``If-Modified-Since`` on details) are answered with 304 and
+    ``If-Match`` on updates with 412. Changes to nested users do not touch
+    ``updated_at`` and therefore do not change the validators.
+    """
+    last_modified_field = 'updated_at'
+
+    def get_object(self):
+        if getattr(self, '_object', None) is None:
+            self._object = super().get_object()
+        return self._object
+
+    def get_list_validators(self, queryset):
+        stats = queryset.order_by().aggregate(last=Max(self.last_modified_field), count=Count('pk'))
+        last = stats['last']
+        etag = digest_etag(
+            self.request.user.pk, self.request.get_full_path(), stats['count'], last and last.isoformat()
+        )
+        return etag, None
+
+    def get_detail_validators(self, obj):
+        return detail_etag(obj, self.last_modified_field), int(getattr(obj, self.last_modified_field).timestamp())
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.get_detail_validators(self.get_object())
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    def check_preconditions(self, request, instance):
+        etag, last_modified = self.get_detail_validators(instance)
+        return conditional_response(request, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        response = self.check_preconditions(request, self.get_object())
+        if response is not None:
+            return response
+        response = super().update(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, *self.get_detail_validators(self.get_object()))
+        return response
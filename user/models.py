@@ -1,9 +1,39 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
 # Create your models here.
 
+def member_team_ids(user, team_ids=None):
+    if team_ids is not None:
+        return team_ids
+    return TeamMembership.objects.filter(user_id=user.pk).values('team_id')
+
+class CompanyQuerySet(models.QuerySet):
+    def visible_to(self, user, team_ids=None):
+        return self.filter(
+            Q(owner_id=user.pk) |
+            Q(Exists(Team.objects.filter(company_id=OuterRef('pk'), id__in=member_team_ids(user, team_ids))))
+        )
+
+class TeamQuerySet(models.QuerySet):
+    def visible_to(self, user, team_ids=None):
+        if team_ids is not None:
+            return self.filter(Q(company__owner_id=user.pk) | Q(id__in=team_ids))
+        return self.filter(
+            Q(company__owner_id=user.pk) |
+            Q(Exists(TeamMembership.objects.filter(team_id=OuterRef('pk'), user_id=user.pk)))
+        )
+
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user, team_ids=None):
+        return self.filter(team_id__in=member_team_ids(user, team_ids))
+
+class ActivityLogQuerySet(models.QuerySet):
+    def visible_to(self, user, team_ids=None):
+        return self.filter(team_id__in=member_team_ids(user, team_ids))
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
 
@@ -14,6 +44,9 @@ class Company(models.Model):
     name = models.CharField(max_length=255)
     owner = models.ForeignKey('User', on_delete=models.CASCADE, related_name='owned_companies')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CompanyQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -23,6 +56,9 @@ class Team(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TeamQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.company.name} / {self.name}"
@@ -39,6 +75,10 @@ class TeamMembership(models.Model):
 
     class Meta:
         unique_together = ('user', 'team')
+        indexes = [
+            models.Index(fields=['team', 'user', 'role'], name='membership_team_user_role_idx'),
+            models.Index(fields=['user', 'team', 'role'], name='membership_user_team_role_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} in {self.team.name} as {self.role}"
@@ -62,6 +102,75 @@ class Task(models.Model):
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', 'is_deleted'], name='task_team_deleted_idx'),
+            models.Index(fields=['team', 'due_date', '-created_at'], condition=Q(is_deleted=False), name='task_live_team_due_idx'),
+            models.Index(fields=['team', '-created_at'], condition=Q(is_deleted=False), name='task_live_team_created_idx'),
+            models.Index(fields=['team', 'status', '-created_at'], condition=Q(is_deleted=False), name='task_live_team_status_idx'),
+            models.Index(fields=['assigned_to', 'status'], condition=Q(is_deleted=False), name='task_live_assignee_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], condition=Q(is_deleted=False), name='task_live_assignee_created_idx'),
+            models.Index(fields=['due_date'], condition=Q(is_deleted=False), name='task_live_due_idx'),
+            models.Index(fields=['team', 'updated_at', 'id'], name='task_team_updated_idx'),
+        ]
+
+    _loaded_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        return {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames)
+        }
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if self._loaded_values is None or fields is None:
+            self._loaded_values = self._snapshot()
+        else:
+            attnames = {self._meta.get_field(name).attname for name in fields}
+            self._loaded_values.update(self._snapshot(attnames))
+
+    @property
+    def changed_fields(self):
+        """
+        Names of the fields whose value differs from the one loaded from the
+        database. Instances that were not loaded from the database report
+        every field as changed.
+        """
+        fields = [f for f in self._meta.concrete_fields if not f.primary_key]
+        if self._loaded_values is None:
+            return {f.name for f in fields}
+        missing = object()
+        return {
+            f.name for f in fields
+            if f.attname in self.__dict__
+            and self._loaded_values.get(f.attname, missing) != self.__dict__[f.attname]
+        }
+
+    def has_changed(self, name):
+        return name in self.changed_fields
+
+    def original_value(self, name):
+        attname = self._meta.get_field(name).attname
+        if self._loaded_values is None:
+            return None
+        return self._loaded_values.get(attname)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self._loaded_values is not None and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self.changed_fields | {'updated_at'}
+        super().save(*args, **kwargs)
+        self._loaded_values = self._snapshot()
+
     def soft_delete(self):
         self.is_deleted = True
         self.deleted_at = timezone.now()
@@ -70,6 +179,49 @@ class Task(models.Model):
     def __str__(self):
         return self.title
 
+class TeamTaskStats(models.Model):
+    """
+    Live task counts per (team, status, assignee) bucket, one row each,
+    kept up to date by the task write paths. Rows that drop to zero are
+    deleted.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='task_stats')
+    status = models.CharField(max_length=32, choices=Task.STATUS_CHOICES)
+    assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['team', 'status', 'assigned_to'], condition=Q(assigned_to__isnull=False),
+                name='team_stats_assigned_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['team', 'status'], condition=Q(assigned_to__isnull=True), name='team_stats_unassigned_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} {self.status}: {self.count}"
+
+class TeamTaskDueStats(models.Model):
+    """
+    Live counts of a team's open (not done) tasks per due date, one row
+    each, so overdue totals read one row per past due date instead of the
+    tasks. Rows that drop to zero are deleted.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='task_due_stats')
+    due_date = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team', 'due_date'], name='team_due_stats_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} {self.due_date}: {self.count}"
+
 class ActivityLog(models.Model):
     ACTION_CHOICES = (
         ('created', 'Created'),
@@ -78,10 +230,55 @@ class ActivityLog(models.Model):
         ('deleted', 'Deleted'),
     )
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='activity_logs')
+    # Copy of task.team, so the feed is scoped without joining the task table.
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='activity_logs')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     note = models.TextField(blank=True)
 
+    objects = ActivityLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', '-timestamp'], name='activity_task_time_idx'),
+            models.Index(fields=['team', '-timestamp'], name='activity_team_time_idx'),
+            models.Index(fields=['-timestamp'], name='activity_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.action} by {self.user} on {self.timestamp}"
+
+class ActivityLogRollup(models.Model):
+    """
+    Daily per-team, per-action counts of activity logs that have been
+    archived, so history stays queryable after the rows are deleted.
+    Days are in the active time zone.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='activity_rollups')
+    day = models.DateField()
+    action = models.CharField(max_length=20, choices=ActivityLog.ACTION_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('team', 'day', 'action')
+
+    def __str__(self):
+        return f"{self.team_id} {self.day} {self.action}: {self.count}"
+
+class ActivityLogArchive(models.Model):
+    """A gzip NDJSON file holding one team's archived logs between ``start`` and ``end``."""
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='activity_archives')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    file = models.FileField(upload_to='activity-archive/')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', 'start'], name='activity_archive_team_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} {self.start:%Y-%m-%d}..{self.end:%Y-%m-%d} ({self.row_count})"
@@ -1,5 +1,189 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination, Cursor
+from rest_framework.utils.urls import remove_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that caches ``COUNT(*)`` per query for a short time."""
+    timeout = 30
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'page-count:' + hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.timeout)
+        return count
+
+
+class CachedCountPagination(StandardResultsSetPagination):
+    django_paginator_class = CachedCountPaginator
+
+
+def encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination over the active ordering plus ``id`` as a tiebreaker.
+
+    The cursor stores the ordering values of the last (or first) row of
+    the page, so pages stay stable when rows are inserted and the database
+    never scans past an OFFSET. NULLs sort after every value in ascending
+    order and before every value in descending order on every backend.
+
+    Clients that need totals can opt into page-number pagination by passing
+    ``page``; that mode caches its ``COUNT(*)`` briefly.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+    page_number_class = CachedCountPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        if self.page_number is not None:
+            return self.page_number.paginate_queryset(queryset, request, view)
+        return self.finish_page(list(queryset))
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        Return the queryset for the requested page, sliced one row past the
+        page size, and remember what is needed to build the page links.
+        """
+        self.page_number = None
+        if self.page_number_class is not None and 'page' in request.query_params:
+            self.page_number = self.page_number_class()
+            return queryset.order_by(*self.get_ordering(request, queryset, view))
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        directions = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        reverse = self.cursor is not None and self.cursor.reverse
+        if reverse:
+            directions = [(name, not descending) for name, descending in directions]
+        self.directions = directions
+
+        queryset = queryset.order_by(*(
+            F(name).desc(nulls_first=True) if descending else F(name).asc(nulls_last=True)
+            for name, descending in directions
+        ))
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(self.cursor.position))
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.page = rows
+        self.has_next = has_more if not reverse else self.cursor is not None
+        self.has_previous = self.cursor is not None if not reverse else has_more
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.page_number is not None:
+            return self.page_number.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering and queryset.query.order_by and all(isinstance(o, str) for o in queryset.query.order_by):
+            ordering = queryset.query.order_by
+        ordering = list(ordering or self.ordering)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return tuple(name.replace('pk', 'id') if name.lstrip('-') == 'pk' else name for name in ordering)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            position = json.loads(cursor.position)
+            assert isinstance(position, list) and len(position) == len(self.ordering)
+        except (TypeError, ValueError, AssertionError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def after(self, position):
+        """Build the filter selecting rows strictly after ``position``."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.directions, position):
+            if value is None:
+                later = Q(**{f'{name}__isnull': False}) if descending else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'lt' if descending else 'gt'
+                later = Q(**{f'{name}__{lookup}': value})
+                if not descending:
+                    later |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & later
+            equal &= same
+        return condition
+
+    def position(self, row):
+        names = [name.lstrip('-') for name in self.ordering]
+        if isinstance(row, dict):
+            return [encode_value(row[name]) for name in names]
+        return [encode_value(getattr(row, name)) for name in names]
+
+    def link(self, row, reverse):
+        cursor = Cursor(offset=0, reverse=reverse, position=json.dumps(self.position(row)))
+        return self.encode_cursor(cursor)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.link(self.page[0], reverse=True)
+
+
+class TaskPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ActivityLogPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
@@ -0,0 +1,150 @@
+import gzip
+import time
+from collections import Counter
+from datetime import datetime, time as day_time, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exports import ACTIVITY_LOG_COLUMNS, ndjson_lines
+from .importers import read_rows
+from .models import ActivityLog, ActivityLogArchive, ActivityLogRollup
+
+NAMES = [name for name, _ in ACTIVITY_LOG_COLUMNS]
+LOOKUPS = [lookup for _, lookup in ACTIVITY_LOG_COLUMNS]
+
+
+def retention_settings():
+    return {'DAYS': 365, 'ACTIONS': {}, 'BATCH_SIZE': 5000, **getattr(settings, 'ACTIVITY_LOG_RETENTION', {})}
+
+
+def expired(now=None, days=None, actions=None):
+    """Logs past their action's retention period; actions kept forever never match."""
+    config = retention_settings()
+    now = now or timezone.now()
+    days = config['DAYS'] if days is None else days
+    actions = {**config['ACTIONS'], **(actions or {})}
+    condition = Q(pk__in=[])
+    for action, _ in ActivityLog.ACTION_CHOICES:
+        keep = actions.get(action, days)
+        if keep is not None:
+            condition |= Q(action=action, timestamp__lt=now - timedelta(days=keep))
+    return condition
+
+
+def add_rollups(team_id, counts):
+    for (day, action), count in counts.items():
+        rows = ActivityLogRollup.objects.filter(team_id=team_id, day=day, action=action)
+        if not rows.update(count=F('count') + count):
+            ActivityLogRollup.objects.create(team_id=team_id, day=day, action=action, count=count)
+
+
+class Archiver:
+    """
+    Moves expired logs into ``ActivityLogArchive`` files one team and
+    ``batch_size`` rows at a time, oldest first. Each batch's file is
+    written before a short transaction records the archive, adds its
+    rollups and deletes the rows by primary key, so the live table is
+    never locked for more than one batch; ``pause`` seconds between
+    batches leave room for regular writes. A batch whose rows another run
+    has already locked or deleted is rolled back and that team is left to
+    the other run, so concurrent runs never count a row twice.
+    """
+
+    def __init__(self, condition, batch_size=None, pause=0):
+        self.condition = condition
+        self.batch_size = batch_size or retention_settings()['BATCH_SIZE']
+        self.pause = pause
+
+    def teams(self):
+        return list(ActivityLog.objects.filter(self.condition).values_list('team_id', flat=True).distinct().order_by())
+
+    def pending(self):
+        rows = ActivityLog.objects.filter(self.condition).values('action').annotate(n=Count('id')).order_by()
+        return {row['action']: row['n'] for row in rows}
+
+    def run(self):
+        archived = Counter()
+        for team_id in self.teams():
+            while count := self.archive_batch(team_id):
+                archived[team_id] += count
+                if self.pause:
+                    time.sleep(self.pause)
+        return archived
+
+    def archive_batch(self, team_id):
+        rows = list(
+            ActivityLog.objects.filter(self.condition, team_id=team_id)
+            .order_by('timestamp', 'id').values_list(*LOOKUPS)[:self.batch_size]
+        )
+        if not rows:
+            return 0
+        timestamp = NAMES.index('timestamp')
+        start, end = rows[0][timestamp], rows[-1][timestamp]
+        data = gzip.compress(b''.join(ndjson_lines(NAMES, rows, len(rows))))
+        name = default_storage.save(
+            f'activity-archive/team-{team_id}/{start:%Y%m%dT%H%M%S}-{rows[0][0]}.ndjson.gz', ContentFile(data)
+        )
+        action = NAMES.index('action')
+        try:
+            with transaction.atomic():
+                claimed = list(
+                    ActivityLog.objects.select_for_update(skip_locked=True)
+                    .filter(pk__in=[row[0] for row in rows]).values_list('pk', flat=True)
+                )
+                if len(claimed) < len(rows) or ActivityLog.objects.filter(pk__in=claimed).delete()[0] < len(rows):
+                    transaction.set_rollback(True)
+                    default_storage.delete(name)
+                    return 0
+                ActivityLogArchive.objects.create(team_id=team_id, start=start, end=end, row_count=len(rows), file=name)
+                add_rollups(team_id, Counter((timezone.localdate(row[timestamp]), row[action]) for row in rows))
+        except Exception:
+            default_storage.delete(name)
+            raise
+        return len(rows)
+
+
+def archived_rows(archives, after=None, before=None):
+    """Rows of ``archives``' files, in file order, limited to ``[after, before]``."""
+    for archive in archives:
+        with archive.file.open('rb') as stream, gzip.open(stream) as lines:
+            for _, row in read_rows(lines, 'ndjson'):
+                stamp = parse_datetime(row['timestamp'])
+                if (after and stamp < after) or (before and stamp > before):
+                    continue
+                yield [row.get(name) for name in NAMES]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, day_time.min))
+
+
+def daily_counts(team_ids, after=None, before=None):
+    """
+    Per-day, per-team, per-action activity counts from the rollups of
+    archived logs plus the live table, for days in ``[after, before]``.
+    """
+    rollups = ActivityLogRollup.objects.filter(team_id__in=team_ids)
+    live = ActivityLog.objects.filter(team_id__in=team_ids)
+    if after:
+        rollups = rollups.filter(day__gte=after)
+        live = live.filter(timestamp__gte=day_start(after))
+    if before:
+        rollups = rollups.filter(day__lte=before)
+        live = live.filter(timestamp__lt=day_start(before + timedelta(days=1)))
+    counts = Counter()
+    for team_id, day, action, count in rollups.values_list('team_id', 'day', 'action', 'count'):
+        counts[day, team_id, action] += count
+    live = live.annotate(day=TruncDate('timestamp')).values_list('day', 'team_id', 'action').annotate(n=Count('id'))
+    for day, team_id, action, count in live.order_by():
+        counts[day, team_id, action] += count
+    return [
+        {'day': day, 'team': team_id, 'action': action, 'count': count}
+        for (day, team_id, action), count in sorted(counts.items())
+    ]
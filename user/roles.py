@@ -0,0 +1,132 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import TeamMembership
+
+CACHE_KEY = 'team-roles:{}'
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+cache_stats = CacheStats()
+
+
+def role_cache():
+    return caches[settings.TEAM_ROLE_CACHE_ALIAS]
+
+
+def invalidate_team_roles(user_ids):
+    keys = [CACHE_KEY.format(pk) for pk in set(user_ids)]
+    if keys:
+        role_cache().delete_many(keys)
+        # A request reading before the commit can re-cache the old roles.
+        transaction.on_commit(lambda: role_cache().delete_many(keys))
+
+
+def as_pk(value):
+    pk = getattr(value, 'pk', value)
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+class TeamRoles:
+    """
+    A user's ``{team_id: role}`` map, loaded with a single query the first
+    time it is needed and kept for the rest of the request. Maps are also
+    shared across requests through the ``TEAM_ROLE_CACHE_ALIAS`` cache and
+    invalidated from the membership, team and company signals.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = None
+
+    @property
+    def roles(self):
+        if self._roles is None:
+            self._roles = self.load()
+        return self._roles
+
+    def load(self):
+        if not self.user.is_authenticated:
+            return {}
+        cache = role_cache()
+        key = CACHE_KEY.format(self.user.pk)
+        roles = cache.get(key)
+        cache_stats.record(roles is not None)
+        if roles is None:
+            roles = dict(TeamMembership.objects.filter(user_id=self.user.pk).values_list('team_id', 'role'))
+            cache.set(key, roles, settings.TEAM_ROLE_CACHE_TIMEOUT)
+        return roles
+
+    async def aload(self):
+        """Populate the map from async code, using the same cache."""
+        if self._roles is not None:
+            return self._roles
+        if not self.user.is_authenticated:
+            self._roles = {}
+            return self._roles
+        cache = role_cache()
+        key = CACHE_KEY.format(self.user.pk)
+        roles = await cache.aget(key)
+        cache_stats.record(roles is not None)
+        if roles is None:
+            queryset = TeamMembership.objects.filter(user_id=self.user.pk).values_list('team_id', 'role')
+            roles = {team_id: role async for team_id, role in queryset}
+            await cache.aset(key, roles, settings.TEAM_ROLE_CACHE_TIMEOUT)
+        self._roles = roles
+        return roles
+
+    def role(self, team):
+        return self.roles.get(as_pk(team))
+
+    def is_member(self, team):
+        return self.role(team) is not None
+
+    def is_admin(self, team):
+        return self.role(team) == 'admin'
+
+    def team_ids(self):
+        return list(self.roles)
+
+    def admin_team_ids(self):
+        return [team_id for team_id, role in self.roles.items() if role == 'admin']
+
+    def set(self, team, role):
+        self.roles[as_pk(team)] = role
+
+    def discard(self, team):
+        self.roles.pop(as_pk(team), None)
+
+
+def get_team_roles(request):
+    """Return the request's ``TeamRoles``, creating it on first use."""
+    roles = getattr(request, 'team_roles', None)
+    if roles is None or roles.user.pk != request.user.pk:
+        roles = TeamRoles(request.user)
+        request.team_roles = roles
+    return roles
@@ -0,0 +1,200 @@
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import Task, User
+
+# model -> (index name, indexed columns)
+INDEXES = {
+    Task: ('user_task_fts', ('title', 'description')),
+    User: ('user_user_fts', ('username', 'email', 'first_name', 'last_name')),
+}
+
+
+class LikeSearchBackend:
+    """Fallback used when no full-text index is available: DRF's icontains search."""
+    available = False
+    rank_ordering = None
+
+    def create_index(self, schema_editor, model):
+        pass
+
+    def drop_index(self, schema_editor, model):
+        pass
+
+    def index(self, model, objects):
+        pass
+
+    def remove(self, model, pks):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(LikeSearchBackend):
+    """
+    SQLite FTS5 tables keyed by the row's primary key. Rows are written by
+    ``index()``/``remove()`` from the model save and delete paths; every
+    term is matched as a prefix and results are ranked with ``bm25()``.
+    """
+    rank_ordering = 'search_rank'
+
+    @cached_property
+    def available(self):
+        # FTS5 is optional in SQLite builds; the migration skips the tables without it.
+        tables = set(connection.introspection.table_names())
+        return all(table in tables for table, columns in INDEXES.values())
+
+    def create_index(self, schema_editor, model):
+        table, columns = INDEXES[model]
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({', '.join(columns)}, prefix='2 3')"
+        )
+        schema_editor.execute(self.populate_sql(model))
+
+    def drop_index(self, schema_editor, model):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {INDEXES[model][0]}')
+
+    def index(self, model, objects):
+        table, columns = INDEXES[model]
+        rows = [(obj.pk, *(getattr(obj, column) or '' for column in columns)) for obj in objects]
+        if not rows or not self.available:
+            return
+        placeholders = ', '.join(['%s'] * (len(columns) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES ({placeholders})", rows
+            )
+
+    def remove(self, model, pks):
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {INDEXES[model][0]} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def populate_sql(self, model):
+        table, columns = INDEXES[model]
+        return (
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+            f"SELECT id, {', '.join(columns)} FROM {model._meta.db_table}"
+        )
+
+    def rebuild(self, model):
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEXES[model][0]}')
+            cursor.execute(self.populate_sql(model))
+
+    def match_query(self, terms):
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, queryset, terms):
+        # Joined rather than correlated: FTS5 evaluates MATCH once per query
+        # and exposes bm25() as the hidden ``rank`` column of each match.
+        table = INDEXES[queryset.model][0]
+        base = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.rowid = "{base}"."id"', f'{table} MATCH %s'],
+            params=[self.match_query(terms)],
+        ).annotate(search_rank=RawSQL(f'{table}.rank', []))
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """
+    PostgreSQL GIN expression indexes over ``to_tsvector`` of the indexed
+    columns. The database maintains the index itself, so ``index()`` and
+    ``remove()`` have nothing to do. Terms are matched as prefixes and
+    results ranked with ``ts_rank``.
+    """
+    available = True
+    rank_ordering = '-search_rank'
+    config = 'simple'
+
+    def document(self, model):
+        base = model._meta.db_table
+        columns = " || ' ' || ".join(f'coalesce("{base}"."{c}", \'\')' for c in INDEXES[model][1])
+        return f"to_tsvector('{self.config}', {columns})"
+
+    def create_index(self, schema_editor, model):
+        table = INDEXES[model][0]
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_gin ON {model._meta.db_table} USING GIN (({self.document(model)}))'
+        )
+
+    def drop_index(self, schema_editor, model):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEXES[model][0]}_gin')
+
+    def match_query(self, terms):
+        words = [''.join(ch for ch in term if ch.isalnum() or ch in '_-@.') for term in terms]
+        return ' & '.join(f"'{word}':*" for word in words if word)
+
+    def search(self, queryset, terms):
+        query = self.match_query(terms)
+        if not query:
+            return queryset
+        document = self.document(queryset.model)
+        tsquery = f"to_tsquery('{self.config}', %s)"
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT id FROM {queryset.model._meta.db_table} WHERE {document} @@ {tsquery}', [query])
+        ).annotate(search_rank=RawSQL(f'ts_rank({document}, {tsquery})', [query]))
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The ``SEARCH_BACKEND`` setting, or the backend matching the database vendor."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'SEARCH_BACKEND', None)
+                backend_class = import_string(path) if path else VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)
+                _backend = backend_class()
+    return _backend
+
+
+def index_objects(model, objects):
+    get_backend().index(model, objects)
+
+
+def remove_objects(model, pks):
+    get_backend().remove(model, pks)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ``SearchFilter`` that uses the configured full-text index for models
+    listed in ``INDEXES`` and falls back to icontains lookups otherwise.
+    Without an explicit ``ordering`` parameter results are ordered by rank.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        backend = get_backend()
+        if not terms or not backend.available or queryset.model not in INDEXES:
+            return super().filter_queryset(request, queryset, view)
+        queryset = backend.search(queryset, terms)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(backend.rank_ordering, 'id')
+        return queryset
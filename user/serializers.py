@@ -1,9 +1,44 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Company, Team, TeamMembership, Task, ActivityLog
+from .metrics import timed_serialization
+from .models import Company, Team, TeamMembership, Task, ActivityLog, ActivityLogArchive
 
 User = get_user_model()
 
+
+def split_param(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Honour ``fields`` and ``expand`` from the serializer context.
+
+    ``fields`` limits the output to the named fields. When ``expand`` is
+    given, relations listed in ``expandable_fields`` that it does not name
+    are rendered as primary keys instead of nested objects. Without either
+    key the serializer behaves as declared. Rendering time is reported to
+    the request metrics.
+    """
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested or field.write_only}
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name in self.expandable_fields:
+                if name in fields and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=6)
 
@@ -23,21 +58,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     owner = UserProfileSerializer(read_only=True)
+    expandable_fields = ('owner',)
 
     class Meta:
         model = Company
         fields = ('id', 'name', 'owner', 'created_at')
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     company = serializers.PrimaryKeyRelatedField(queryset=Company.objects.all())
     class Meta:
         model = Team
         fields = ('id', 'company', 'name', 'description', 'created_at')
 
-class TeamMemberSerializer(serializers.ModelSerializer):
+class TeamMemberSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
+    expandable_fields = ('user',)
     user_id = serializers.PrimaryKeyRelatedField(write_only=True, source='user', queryset=User.objects.all())
     role = serializers.ChoiceField(choices=TeamMembership.ROLE_CHOICES)
 
@@ -46,9 +83,10 @@ class TeamMemberSerializer(serializers.ModelSerializer):
         fields = ('id', 'team', 'user', 'user_id', 'role', 'joined_at')
         read_only_fields = ('joined_at', 'team', 'user')
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_by = UserProfileSerializer(read_only=True)
     assigned_to = UserProfileSerializer(read_only=True)
+    expandable_fields = ('created_by', 'assigned_to')
     assigned_to_id = serializers.PrimaryKeyRelatedField(write_only=True, source='assigned_to', queryset=User.objects.all(), allow_null=True, required=False)
 
     class Meta:
@@ -61,9 +99,20 @@ class TaskUpdateMemberSerializer(serializers.ModelSerializer):
         model = Task
         fields = ('status', 'description')
 
-class ActivityLogSerializer(serializers.ModelSerializer):
+class ActivityLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
+    expandable_fields = ('user',)
     task = serializers.PrimaryKeyRelatedField(read_only=True)
     class Meta:
         model = ActivityLog
         fields = ('id', 'task', 'user', 'action', 'timestamp', 'note')
+
+class ActivityLogArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ActivityLogArchive
+        fields = ('id', 'team', 'start', 'end', 'row_count', 'created_at')
+
+class DailyActivityQuerySerializer(serializers.Serializer):
+    team = serializers.IntegerField(required=False)
+    after = serializers.DateField(required=False)
+    before = serializers.DateField(required=False)
@@ -1,40 +1,75 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Task, ActivityLog
-
-@receiver(pre_save, sender=Task)
-def task_pre_save(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = sender.objects.get(pk=instance.pk)
-            instance._old_assigned_to_id = old.assigned_to_id
-            instance._old_is_deleted = old.is_deleted
-        except sender.DoesNotExist:
-            instance._old_assigned_to_id = None
-            instance._old_is_deleted = False
+from .activity import activity_entry, log_activity, move_activity
+from .authentication import invalidate_user
+from .events import publish_task_events, task_event
+from . import metrics
+from .models import ActivityLogArchive, Company, Team, TeamMembership, Task, User
+from .roles import invalidate_team_roles
+from .search import index_objects, remove_objects
+from .stats import apply_deltas, move_assignee_counts, original_buckets, current_buckets, record_task_changes
+
+def task_activity(instance, created):
+    if created:
+        return 'created', f"Task '{instance.title}' created"
+    changed = instance.changed_fields
+    if 'assigned_to' in changed:
+        return 'assigned', None
+    if 'is_deleted' in changed and instance.is_deleted:
+        return 'deleted', f"Task '{instance.title}' deleted"
+    return 'updated', f"Task '{instance.title}' updated"
 
 @receiver(post_save, sender=Task)
 def task_post_save(sender, instance, created, **kwargs):
-    user = instance.created_by
+    action, note = task_activity(instance, created)
+    if not created:
+        move_activity([instance])
+    log_activity([activity_entry(instance, action, note)])
+    record_task_changes([instance], created)
+    if created or instance.changed_fields & {'title', 'description'}:
+        index_objects(Task, [instance])
+    publish_task_events([task_event(instance, action)])
 
-    if created:
-        ActivityLog.objects.create(task=instance, user=user, action='created', 
-                                   note=f"Task '{instance.title}' created")
-        return
-
-    old_assigned = getattr(instance, '_old_assigned_to_id', None)
-    if instance.assigned_to_id != old_assigned:
-        ActivityLog.objects.create(task=instance, user=user,action='assigned',
-                                   note=f"Assigned to {instance.assigned_to}")
-        return
-
-    old_deleted = getattr(instance, '_old_is_deleted', False)
-    if instance.is_deleted and not old_deleted:
-        ActivityLog.objects.create(task=instance, user=user, action='deleted',
-                                   note=f"Task '{instance.title}' deleted")
-        return
-
-    ActivityLog.objects.create(
-        task=instance, user=user, action='updated',
-        note=f"Task '{instance.title}' updated"
-    )
\ No newline at end of file
+@receiver(post_delete, sender=Task)
+def task_post_delete(sender, instance, **kwargs):
+    keys = original_buckets(instance) if instance._loaded_values is not None else current_buckets(instance)
+    apply_deltas({key: -1 for key in keys})
+    remove_objects(Task, [instance.pk])
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, **kwargs):
+    invalidate_user([instance.pk])
+    index_objects(User, [instance])
+
+@receiver(pre_delete, sender=User)
+def user_pre_delete(sender, instance, **kwargs):
+    move_assignee_counts([instance.pk])
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance, **kwargs):
+    invalidate_user([instance.pk])
+    remove_objects(User, [instance.pk])
+
+@receiver([post_save, post_delete], sender=TeamMembership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_team_roles([instance.user_id])
+
+@receiver([post_save, post_delete], sender=Team)
+def team_changed(sender, instance, **kwargs):
+    invalidate_team_roles(TeamMembership.objects.filter(team_id=instance.pk).values_list('user_id', flat=True))
+
+@receiver([post_save, post_delete], sender=Company)
+def company_changed(sender, instance, **kwargs):
+    invalidate_team_roles(
+        TeamMembership.objects.filter(team__company_id=instance.pk).values_list('user_id', flat=True)
+    )
+
+@receiver(post_delete, sender=ActivityLogArchive)
+def archive_post_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: instance.file.delete(save=False))
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    metrics.install(connection)
@@ -0,0 +1,138 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Task, TeamTaskDueStats, TeamTaskStats
+
+BUCKET_FIELDS = ('team_id', 'status', 'assigned_to_id')
+DUE_FIELDS = ('team_id', 'due_date')
+TASK_FIELDS = ('team_id', 'status', 'assigned_to_id', 'due_date', 'is_deleted')
+BUCKETS = {TeamTaskStats: BUCKET_FIELDS, TeamTaskDueStats: DUE_FIELDS}
+
+
+def buckets(team_id, status, assigned_to_id, due_date, is_deleted):
+    """
+    The buckets a task is counted in, as ``(model, *values)`` keys: its
+    (team, status, assignee) bucket and, while open, its due date.
+    """
+    if is_deleted or team_id is None:
+        return set()
+    keys = {(TeamTaskStats, team_id, status, assigned_to_id)}
+    if due_date is not None and status != 'done':
+        keys.add((TeamTaskDueStats, team_id, due_date))
+    return keys
+
+
+def current_buckets(task):
+    return buckets(*(getattr(task, field) for field in TASK_FIELDS))
+
+
+def original_buckets(task):
+    """The buckets the task was counted in when it was loaded."""
+    values = task._loaded_values
+    if values is None:
+        return set()
+    return buckets(*(values.get(field) for field in TASK_FIELDS))
+
+
+def task_deltas(tasks, created=False):
+    deltas = Counter()
+    for task in tasks:
+        old = set() if created else original_buckets(task)
+        new = current_buckets(task)
+        for key in old - new:
+            deltas[key] -= 1
+        for key in new - old:
+            deltas[key] += 1
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Add each delta to its bucket's row. A missing row is created for a
+    positive delta, retrying as an update if a concurrent write created it
+    first; rows that reach zero are deleted. Decrements of a missing row,
+    such as a task deleted along with its team, are ignored.
+    """
+    for (model, *values), delta in deltas.items():
+        if not delta:
+            continue
+        key = dict(zip(BUCKETS[model], values))
+        rows = model.objects.filter(**key)
+        if rows.update(count=F('count') + delta):
+            if delta < 0:
+                rows.filter(count__lte=0).delete()
+            continue
+        if delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**key, count=delta)
+        except IntegrityError:
+            rows.update(count=F('count') + delta)
+
+
+def move_assignee_counts(user_ids):
+    """Move the buckets of ``user_ids`` to the unassigned ones, as their tasks are about to be."""
+    rows = TeamTaskStats.objects.filter(assigned_to_id__in=user_ids)
+    deltas = Counter()
+    for team_id, status, count in rows.values_list('team_id', 'status', 'count'):
+        deltas[TeamTaskStats, team_id, status, None] += count
+    rows.delete()
+    apply_deltas(deltas)
+
+
+def record_task_changes(tasks, created=False):
+    apply_deltas(task_deltas(tasks, created))
+
+
+def rebuild(team_ids=None):
+    """Recompute the buckets of ``team_ids`` (all teams when ``None``) from the task table."""
+    tasks = Task.objects.filter(is_deleted=False)
+    open_tasks = tasks.exclude(status='done').filter(due_date__isnull=False)
+    rebuilt = 0
+    for model, fields, source in ((TeamTaskStats, BUCKET_FIELDS, tasks), (TeamTaskDueStats, DUE_FIELDS, open_tasks)):
+        stats = model.objects.all()
+        if team_ids is not None:
+            source = source.filter(team_id__in=team_ids)
+            stats = stats.filter(team_id__in=team_ids)
+        rows = list(source.values(*fields).annotate(n=Count('id')).order_by())
+        stats.delete()
+        model.objects.bulk_create(model(**{f: row[f] for f in fields}, count=row['n']) for row in rows)
+        rebuilt += len(rows)
+    return rebuilt
+
+
+def summarize(team_ids):
+    """
+    Per-team counts by status, overdue tasks and per-assignee load, read
+    from the buckets alone.
+    """
+    rows = TeamTaskStats.objects.filter(team_id__in=team_ids).values_list('team_id', 'status', 'assigned_to_id', 'count')
+    overdue = dict(
+        TeamTaskDueStats.objects.filter(team_id__in=team_ids, due_date__lt=timezone.localdate())
+        .values('team_id').annotate(n=Sum('count')).values_list('team_id', 'n').order_by()
+    )
+    teams = {
+        team_id: {
+            'team': team_id,
+            'total': 0,
+            'by_status': {status: 0 for status, _ in Task.STATUS_CHOICES},
+            'overdue': overdue.get(team_id, 0),
+            'by_assignee': {},
+        }
+        for team_id in team_ids
+    }
+    for team_id, status, assigned_to_id, count in rows:
+        summary = teams[team_id]
+        summary['total'] += count
+        summary['by_status'][status] = summary['by_status'].get(status, 0) + count
+        load = summary['by_assignee'].setdefault(assigned_to_id, {'user': assigned_to_id, 'open': 0, 'total': 0})
+        load['total'] += count
+        if status != 'done':
+            load['open'] += count
+    for summary in teams.values():
+        summary['by_assignee'] = [load for load in summary['by_assignee'].values() if load['total']]
+    return [teams[team_id] for team_id in team_ids]
@@ -1,3 +1,1301 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import tempfile
+import time
+import json
+from unittest import mock
+from datetime import date, timedelta
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test.utils import CaptureQueriesContext
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .activity import ActivityEntry, ActivityLogWriter
+from .async_views import event_stream
+from .authentication import USER_KEY, CachedJWTAuthentication
+from .filters import ActivityLogFilter, TaskFilter
+from .fastpath import RowSerializer
+from .importers import TaskImporter
+from .metrics import registry
+from .renderers import ORJSONParser, ORJSONRenderer
+from .events import BrokerFull, InProcessBroker, get_broker
+from .models import ActivityLog, ActivityLogArchive, ActivityLogRollup, User, Company, Team, TeamMembership, Task, TeamTaskDueStats, TeamTaskStats
+from .roles import CACHE_KEY, cache_stats
+from .search import get_backend
+from .serializers import TeamMemberSerializer
+from .views import ActivityLogViewSet, CompanyViewSet, TaskViewSet, TeamViewSet
+from . import stats
+
+
+class APITestBase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com')
+        cls.member = User.objects.create_user('member', 'member@example.com')
+        cls.company = Company.objects.create(name='Acme', owner=cls.owner)
+        cls.team = Team.objects.create(company=cls.company, name='Core')
+        TeamMembership.objects.create(user=cls.owner, team=cls.team, role='admin')
+        TeamMembership.objects.create(user=cls.member, team=cls.team, role='member')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create_users(self, count):
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com')
+            TeamMembership.objects.create(user=user, team=self.team)
+            users.append(user)
+        return users
+
+    def create_tasks(self, count):
+        users = self.create_users(count)
+        return [
+            Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner, assigned_to=user)
+            for i, user in enumerate(users)
+        ]
+
+
+class QueryCountTests(APITestBase):
+    """
+    List endpoints must issue the same number of queries whatever the page
+    size, i.e. nested relations are joined or prefetched, never N+1.
+    """
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, small=2, large=20, **params):
+        self.count_queries(url, **params)  # warm the role cache
+        self.assertEqual(
+            self.count_queries(url, page_size=small, **params),
+            self.count_queries(url, page_size=large, **params),
+        )
+
+    def test_task_list(self):
+        self.create_tasks(25)
+        self.assertConstantQueries('/api/tasks/')
+
+    def test_activity_log_list(self):
+        self.create_tasks(25)
+        self.assertConstantQueries('/api/activity-logs/')
+
+    def test_company_list(self):
+        for i, user in enumerate(self.create_users(25)):
+            company = Company.objects.create(name=f'Company {i}', owner=user)
+            team = Team.objects.create(company=company, name=f'Team {i}')
+            TeamMembership.objects.create(user=self.owner, team=team)
+        self.assertConstantQueries('/api/companies/')
+
+    def test_team_members(self):
+        url = f'/api/teams/{self.team.pk}/members/'
+        self.count_queries(url)
+        small = self.count_queries(url)
+        self.create_users(25)
+        self.assertEqual(self.count_queries(url), small)
+
+
+class VisibilityTests(APITestBase):
+    def test_scoping_has_no_duplicates(self):
+        other = Team.objects.create(company=self.company, name='Other')
+        TeamMembership.objects.create(user=self.member, team=other)
+        Task.objects.create(team=other, title='Other task', created_by=self.owner)
+        Task.objects.create(team=self.team, title='Core task', created_by=self.owner)
+        self.assertEqual(Company.objects.visible_to(self.member).count(), 1)
+        self.assertEqual(Team.objects.visible_to(self.member).count(), 2)
+        self.assertEqual(Task.objects.visible_to(self.member).count(), 2)
+        self.assertEqual(Task.objects.visible_to(self.owner).count(), 1)
+        self.assertNotIn('DISTINCT', str(Task.objects.visible_to(self.member).query))
+
+    def test_outsider_sees_nothing(self):
+        outsider = User.objects.create_user('outsider', 'outsider@example.com')
+        Task.objects.create(team=self.team, title='Core task', created_by=self.owner)
+        self.assertFalse(Company.objects.visible_to(outsider).exists())
+        self.assertFalse(Team.objects.visible_to(outsider).exists())
+        self.assertFalse(Task.objects.visible_to(outsider).exists())
+
+
+class TeamRoleTests(APITestBase):
+    def membership_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        queries = [q['sql'] for q in ctx.captured_queries if 'user_teammembership' in q['sql']]
+        return response, len(queries)
+
+    def test_admin_update_uses_one_membership_query(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        response, queries = self.membership_queries('patch', f'/api/tasks/{task.pk}/', {'status': 'done'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(queries, 1)
+
+    def test_member_update_uses_one_membership_query(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        self.client.force_authenticate(self.member)
+        response, queries = self.membership_queries('patch', f'/api/tasks/{task.pk}/', {'status': 'done'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(queries, 1)
+
+    def test_create_requires_admin(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.post('/api/tasks/', {'team': self.team.pk, 'title': 'Nope'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.owner)
+        response, queries = self.membership_queries('post', '/api/tasks/', {'team': self.team.pk, 'title': 'Yes'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(queries, 1)
+
+    def test_role_map_is_cached_across_requests(self):
+        cache_stats.reset()
+        response, queries = self.membership_queries('get', '/api/tasks/')
+        self.assertEqual(queries, 1)
+        response, queries = self.membership_queries('get', '/api/tasks/')
+        self.assertEqual(queries, 0)
+        self.assertEqual(cache_stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_membership_change_invalidates_cache(self):
+        other = Team.objects.create(company=self.company, name='Other')
+        Task.objects.create(team=other, title='Other task', created_by=self.owner)
+        self.assertEqual(len(self.client.get('/api/tasks/').data['results']), 0)
+        TeamMembership.objects.create(user=self.owner, team=other)
+        self.assertEqual(len(self.client.get('/api/tasks/').data['results']), 1)
+
+    def test_roles_cached_before_commit_are_evicted(self):
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            TeamMembership.objects.filter(user=self.member, team=self.team).get().delete()
+            self.client.force_authenticate(self.member)
+            self.client.get('/api/tasks/')
+            self.assertIsNotNone(cache.get(CACHE_KEY.format(self.member.pk)))
+        self.assertIsNone(cache.get(CACHE_KEY.format(self.member.pk)))
+
+
+class ChangedFieldsTests(APITestBase):
+    def test_save_writes_only_changed_columns(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        task = Task.objects.get(pk=task.pk)
+        self.assertEqual(task.changed_fields, set())
+        task.status = 'done'
+        self.assertEqual(task.changed_fields, {'status'})
+        with CaptureQueriesContext(connection) as ctx:
+            task.save()
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE'))
+        self.assertIn('"status"', update)
+        self.assertNotIn('"description"', update)
+        self.assertFalse(any(q['sql'].startswith('SELECT') for q in ctx.captured_queries))
+        self.assertEqual(task.changed_fields, set())
+
+    def test_activity_actions(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        task = Task.objects.get(pk=task.pk)
+        task.assigned_to = self.member
+        task.save()
+        task.status = 'done'
+        task.save()
+        task.soft_delete()
+        actions = list(task.activity_logs.order_by('pk').values_list('action', flat=True))
+        self.assertEqual(actions, ['created', 'assigned', 'updated', 'deleted'])
+
+
+class RecordingWriter(ActivityLogWriter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def write(self, entries):
+        self.batches.append(list(entries))
+
+
+class ActivityLogWriterTests(SimpleTestCase):
+    def entries(self, count):
+        return [ActivityEntry(i, None, None, 'updated', 'note', timezone.now(), None) for i in range(count)]
+
+    def test_background_thread_writes_in_batches(self):
+        writer = RecordingWriter(batch_size=2, flush_interval=0.01)
+        writer.enqueue(self.entries(5))
+        writer.flush()
+        writer.stop()
+        self.assertEqual(sum(len(b) for b in writer.batches), 5)
+        self.assertTrue(all(len(b) <= 2 for b in writer.batches))
+
+    def test_stop_flushes_pending_entries(self):
+        writer = RecordingWriter(batch_size=100, flush_interval=60)
+        writer.enqueue(self.entries(3))
+        writer.stop()
+        self.assertEqual(sum(len(b) for b in writer.batches), 3)
+
+    def test_full_queue_writes_inline(self):
+        writer = RecordingWriter(batch_size=100, flush_interval=60, max_queue_size=1)
+        writer.start = lambda: None
+        with self.assertLogs('user.activity', 'WARNING'):
+            writer.enqueue(self.entries(3))
+        self.assertEqual(writer.queue.qsize(), 1)
+        self.assertEqual(sum(len(b) for b in writer.batches), 2)
+
+    def test_failing_entries_do_not_drop_the_batch(self):
+        class FlakyWriter(RecordingWriter):
+            def write(self, entries):
+                if any(entry.note == 'bad' for entry in entries):
+                    raise ValueError('bad entry')
+                super().write(entries)
+
+        writer = FlakyWriter(batch_size=8, flush_interval=0.01)
+        entries = self.entries(8)
+        entries[5] = entries[5]._replace(note='bad')
+        with self.assertLogs('user.activity', 'ERROR') as logs:
+            writer.enqueue(entries)
+            writer.flush()
+            writer.stop()
+        self.assertEqual(sum(len(b) for b in writer.batches), 7)
+        self.assertEqual(len(logs.output), 1)
+
+    def test_synchronous_mode_writes_immediately(self):
+        writer = RecordingWriter(asynchronous=False)
+        writer.log(self.entries(2))
+        self.assertEqual(len(writer.batches), 1)
+        self.assertIsNone(writer._thread)
+
+
+class BulkTaskTests(APITestBase):
+    def bulk(self, operations):
+        response = self.client.post('/api/tasks/bulk/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['results']
+
+    def test_mixed_operations(self):
+        tasks = [Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner) for i in range(3)]
+        results = self.bulk([
+            {'op': 'create', 'data': {'team': self.team.pk, 'title': 'New'}},
+            {'op': 'update', 'id': tasks[0].pk, 'data': {'status': 'done'}},
+            {'op': 'assign', 'id': tasks[1].pk, 'user_id': self.member.pk},
+            {'op': 'delete', 'id': tasks[2].pk},
+            {'op': 'delete', 'id': 0},
+        ])
+        self.assertEqual([r['status'] for r in results], [201, 200, 200, 204, 404])
+        self.assertEqual(results[2]['data']['assigned_to']['id'], self.member.pk)
+        self.assertEqual(Task.objects.get(pk=tasks[0].pk).status, 'done')
+        self.assertTrue(Task.objects.get(pk=tasks[2].pk).is_deleted)
+        new = Task.objects.get(title='New')
+        actions = {
+            task.pk: list(task.activity_logs.values_list('action', flat=True))
+            for task in [new] + tasks
+        }
+        self.assertEqual(actions[new.pk], ['created'])
+        self.assertIn('updated', actions[tasks[0].pk])
+        self.assertIn('assigned', actions[tasks[1].pk])
+        self.assertIn('deleted', actions[tasks[2].pk])
+
+    def test_malformed_operations(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        results = self.bulk([
+            'x',
+            {'op': 'create', 'data': [1]},
+            {'op': 'update', 'id': task.pk, 'data': 'done'},
+            {'op': 'create', 'data': {'team': self.team.pk, 'title': 'Fine'}},
+        ])
+        self.assertEqual([r['status'] for r in results], [400, 400, 400, 201])
+
+    def test_member_permissions(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        outsider = User.objects.create_user('outsider', 'outsider@example.com')
+        self.client.force_authenticate(self.member)
+        results = self.bulk([
+            {'op': 'create', 'data': {'team': self.team.pk, 'title': 'New'}},
+            {'op': 'update', 'id': task.pk, 'data': {'status': 'in_progress', 'title': 'Ignored'}},
+            {'op': 'assign', 'id': task.pk, 'user_id': outsider.pk},
+            {'op': 'delete', 'id': task.pk},
+        ])
+        self.assertEqual([r['status'] for r in results], [403, 200, 403, 403])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.title), ('in_progress', 'Task'))
+
+    def test_query_count_does_not_grow_with_operations(self):
+        def run(count):
+            tasks = [Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner) for i in range(count)]
+            operations = [{'op': 'update', 'id': t.pk, 'data': {'status': 'done'}} for t in tasks]
+            with CaptureQueriesContext(connection) as ctx:
+                self.bulk(operations)
+            return len(ctx.captured_queries)
+        run(1)  # warm the role cache
+        self.assertEqual(run(2), run(10))
+
+
+class KeysetPaginationTests(APITestBase):
+    def walk(self, url, **params):
+        ids = []
+        response = self.client.get(url, {'page_size': 3, **params})
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_task_once_with_null_due_dates(self):
+        for i in range(10):
+            due = None if i % 3 == 0 else date(2026, 1, 1) + timedelta(days=i % 4)
+            Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner, due_date=due)
+        for ordering in ('due_date', '-due_date', '-created_at'):
+            expected = list(
+                self.client.get('/api/tasks/', {'page_size': 100, 'ordering': ordering}).data['results']
+            )
+            ids = self.walk('/api/tasks/', ordering=ordering)
+            self.assertEqual(ids, [row['id'] for row in expected], ordering)
+
+    def test_cursor_survives_inserts_and_goes_back(self):
+        tasks = [Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner) for i in range(6)]
+        first = self.client.get('/api/tasks/', {'page_size': 3})
+        Task.objects.create(team=self.team, title='Newer', created_by=self.owner)
+        second = self.client.get(first.data['next'])
+        self.assertEqual([r['id'] for r in second.data['results']], [t.pk for t in tasks[2::-1]])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual([r['id'] for r in back.data['results']], [r['id'] for r in first.data['results']])
+
+    def test_page_number_mode_is_opt_in(self):
+        self.create_tasks(4)
+        response = self.client.get('/api/activity-logs/', {'page': 1, 'page_size': 3})
+        self.assertEqual(response.data['count'], 4)
+        ids = self.walk('/api/activity-logs/')
+        self.assertEqual(len(set(ids)), 4)
+
+
+@override_settings(CHANGES_FEED_LAG=0)
+class ChangesFeedTests(APITestBase):
+    def test_task_changes_since_token(self):
+        first = Task.objects.create(team=self.team, title='First', created_by=self.owner)
+        second = Task.objects.create(team=self.team, title='Second', created_by=self.owner)
+        response = self.client.get('/api/tasks/changes/')
+        self.assertEqual([t['id'] for t in response.data['changes']], [first.pk, second.pk])
+        token = response.data['next_token']
+
+        idle = self.client.get('/api/tasks/changes/', {'since': token})
+        self.assertEqual((idle.data['changes'], idle.data['deleted'], idle.data['next_token']), ([], [], token))
+
+        Task.objects.get(pk=first.pk).soft_delete()
+        second = Task.objects.get(pk=second.pk)
+        second.status = 'done'
+        second.save()
+        response = self.client.get('/api/tasks/changes/', {'since': token})
+        self.assertEqual([t['id'] for t in response.data['changes']], [second.pk])
+        self.assertEqual([t['id'] for t in response.data['deleted']], [first.pk])
+
+    def test_activity_changes_and_limit(self):
+        self.create_tasks(3)
+        response = self.client.get('/api/activity-logs/changes/', {'limit': 2})
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertTrue(response.data['has_more'])
+        response = self.client.get('/api/activity-logs/changes/', {'since': response.data['next_token']})
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertFalse(response.data['has_more'])
+
+    def test_recent_rows_are_held_back(self):
+        task = Task.objects.create(team=self.team, title='Fresh', created_by=self.owner)
+        with self.settings(CHANGES_FEED_LAG=60):
+            self.assertEqual(self.client.get('/api/tasks/changes/').data['changes'], [])
+            self.assertEqual(self.client.get('/api/activity-logs/changes/').data['changes'], [])
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        with self.settings(CHANGES_FEED_LAG=60):
+            response = self.client.get('/api/tasks/changes/')
+        self.assertEqual([t['id'] for t in response.data['changes']], [task.pk])
+
+    def test_activity_feed_waits_for_lower_unsettled_ids(self):
+        first, second = self.create_tasks(2)
+        now = timezone.now()
+        ActivityLog.objects.filter(task=first).update(timestamp=now - timedelta(seconds=2))
+        ActivityLog.objects.filter(task=second).update(timestamp=now - timedelta(seconds=10))
+        with self.settings(CHANGES_FEED_LAG=5):
+            response = self.client.get('/api/activity-logs/changes/')
+        self.assertEqual(response.data['changes'], [])
+        response = self.client.get('/api/activity-logs/changes/', {'since': response.data['next_token']})
+        self.assertEqual([row['task'] for row in response.data['changes']], [first.pk, second.pk])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/tasks/changes/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestTests(APITestBase):
+    def test_list_not_modified(self):
+        self.create_tasks(3)
+        response = self.client.get('/api/tasks/')
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        Task.objects.create(team=self.team, title='New', created_by=self.owner)
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_list_has_no_last_modified(self):
+        first, *_ = self.create_tasks(3)
+        response = self.client.get('/api/tasks/')
+        self.assertNotIn('Last-Modified', response.headers)
+        self.client.delete(f'/api/tasks/{first.pk}/')
+        response = self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_detail_if_match(self):
+        task = Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        url = f'/api/tasks/{task.pk}/'
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.patch(url, {'status': 'done'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        response = self.client.patch(url, {'status': 'todo'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_team_company_and_profile(self):
+        for url in ('/api/teams/', f'/api/teams/{self.team.pk}/', '/api/companies/', '/api/profile/me/'):
+            etag = self.client.get(url).headers['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+
+class EventBrokerTests(SimpleTestCase):
+    async def test_publish_reaches_team_subscribers_only(self):
+        broker = InProcessBroker()
+        member, other = broker.subscribe([1]), broker.subscribe([2])
+        broker.publish({'event': 'task.updated', 'team': 1, 'data': {}})
+        self.assertEqual((await member.get(timeout=1))['event'], 'task.updated')
+        self.assertTrue(other.queue.empty())
+
+    async def test_bounded_queues_and_subscribers(self):
+        broker = InProcessBroker(max_subscribers=1, queue_size=2)
+        subscription = broker.subscribe([1])
+        with self.assertRaises(BrokerFull):
+            broker.subscribe([1])
+        for i in range(5):
+            broker.publish({'event': 'task.updated', 'team': 1, 'data': {'id': i}})
+        await asyncio.sleep(0)
+        self.assertEqual(broker.stats()['queued'], 2)
+        self.assertEqual(broker.stats()['dropped'], 3)
+        self.assertEqual((await subscription.get(timeout=1))['data']['id'], 3)
+        broker.unsubscribe(subscription)
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+
+class TaskStreamTests(APITestBase):
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get('/api/tasks/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_receives_team_events(self):
+        token = str(AccessToken.for_user(self.owner))
+        response = await self.async_client.get('/api/tasks/stream/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        get_broker().publish({'event': 'task.created', 'team': self.team.pk, 'data': {'id': 1}})
+        self.assertEqual(await anext(stream), b'event: task.created\ndata: {"id":1}\n\n')
+        await stream.aclose()
+
+    async def test_closing_stream_unsubscribes(self):
+        broker = InProcessBroker()
+        stream = event_stream(broker, broker.subscribe([self.team.pk]), heartbeat=0.01)
+        self.assertEqual(await anext(stream), ': connected\n\n')
+        self.assertEqual(await anext(stream), ': ping\n\n')
+        await stream.aclose()
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+    async def test_stream_follows_membership(self):
+        broker = InProcessBroker()
+        teams = [self.team.pk]
+
+        async def team_ids():
+            return teams
+
+        stream = event_stream(broker, broker.subscribe(teams), 0.01, team_ids)
+        self.assertEqual(await anext(stream), ': connected\n\n')
+        broker.publish({'event': 'task.created', 'team': self.team.pk, 'data': {'id': 1}})
+        self.assertEqual(await anext(stream), 'event: task.created\ndata: {"id":1}\n\n')
+        teams = []
+        await asyncio.sleep(0.02)
+        broker.publish({'event': 'task.created', 'team': self.team.pk, 'data': {'id': 2}})
+        self.assertEqual(await anext(stream), ': ping\n\n')
+        broker.publish({'event': 'task.created', 'team': self.team.pk, 'data': {'id': 3}})
+        self.assertEqual(await anext(stream), ': ping\n\n')
+        await stream.aclose()
+
+    async def test_stream_ends_when_token_expires(self):
+        broker = InProcessBroker()
+        stream = event_stream(broker, broker.subscribe([self.team.pk]), 60, expires_at=time.time() + 0.05)
+        self.assertEqual([line async for line in stream], [': connected\n\n', 'event: token.expired\ndata: {}\n\n'])
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+    def test_task_save_publishes_on_commit(self):
+        published = get_broker().stats()['published']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(team=self.team, title='Task', created_by=self.owner)
+        self.assertEqual(get_broker().stats()['published'], published + 1)
+
+
+class AsyncReadPathTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.owner)}'}}
+        for i, task in enumerate(self.create_tasks(5)):
+            task = Task.objects.get(pk=task.pk)
+            task.due_date = date(2026, 1, 1) + timedelta(days=i % 3)
+            task.save()
+
+    async def compare(self, sync_url, async_url, params=None, key='results'):
+        expected = await sync_to_async(self.client.get)(sync_url, params)
+        response = await self.async_client.get(async_url, params, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        expected = json.loads(expected.content)
+        if key:
+            data, expected = data[key], expected[key]
+        self.assertEqual(data, expected)
+
+    async def test_task_list_matches_sync(self):
+        await self.compare('/api/tasks/', '/api/async/tasks/')
+        await self.compare('/api/tasks/', '/api/async/tasks/', {'ordering': 'due_date', 'page_size': 2})
+        await self.compare('/api/tasks/', '/api/async/tasks/', {'search': 'Task 3'})
+        await self.compare('/api/tasks/', '/api/async/tasks/', {'page': 1, 'page_size': 2})
+        await self.compare('/api/tasks/', '/api/async/tasks/', {'fields': 'id,assigned_to'}, key='users')
+
+    async def test_query_token_only_accepted_by_stream(self):
+        token = str(AccessToken.for_user(self.owner))
+        response = await self.async_client.get('/api/async/profile/me/', {'token': token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_token_validation_uses_async_cache(self):
+        sync = mock.patch.object(CachedJWTAuthentication, 'get_validated_token', side_effect=AssertionError('sync'))
+        for _ in range(2):
+            with sync:
+                response = await self.async_client.get('/api/async/profile/me/', **self.auth)
+            self.assertEqual(response.status_code, 200, response.content)
+
+    async def test_detail_activity_and_profile_match_sync(self):
+        task = await Task.objects.afirst()
+        await self.compare(f'/api/tasks/{task.pk}/', f'/api/async/tasks/{task.pk}/', key=None)
+        await self.compare('/api/activity-logs/', '/api/async/activity-logs/')
+        await self.compare('/api/profile/me/', '/api/async/profile/me/', key=None)
+
+    async def test_cold_search_backend(self):
+        with mock.patch('user.search._backend', None):
+            response = await self.async_client.get('/api/async/tasks/', {'search': 'Task 3'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Task 3'])
+
+    async def test_invalid_input_matches_sync_status(self):
+        for params in ({'cursor': 'garbage'}, {'page': 'abc'}, {'status': 'bogus'}, {'team__in': 'a,b'}):
+            with self.subTest(params=params):
+                expected = await sync_to_async(self.client.get)('/api/tasks/', params)
+                response = await self.async_client.get('/api/async/tasks/', params, **self.auth)
+                self.assertIn(response.status_code, (400, 404))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), json.loads(expected.content))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/tasks/')
+        self.assertEqual(response.status_code, 401)
+
+
+class TeamTaskStatsTests(APITestBase):
+    def snapshot(self):
+        return self.client.get(f'/api/teams/{self.team.pk}/stats/').data
+
+    def test_counters_follow_writes_and_match_rebuild(self):
+        past = timezone.localdate() - timedelta(days=1)
+        tasks = [Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner) for i in range(4)]
+        task = Task.objects.get(pk=tasks[0].pk)
+        task.assigned_to = self.member
+        task.due_date = past
+        task.save()
+        Task.objects.get(pk=tasks[1].pk).soft_delete()
+        self.client.post('/api/tasks/bulk/', {'operations': [
+            {'op': 'update', 'id': tasks[2].pk, 'data': {'status': 'done'}},
+            {'op': 'create', 'data': {'team': self.team.pk, 'title': 'New', 'due_date': str(past)}},
+        ]}, format='json')
+        Task.objects.get(pk=tasks[3].pk).delete()
+
+        data = self.snapshot()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['by_status'], {'todo': 2, 'in_progress': 0, 'done': 1})
+        self.assertEqual(data['overdue'], 2)
+        loads = {load['user']: load for load in data['by_assignee']}
+        self.assertEqual(loads[self.member.pk], {'user': self.member.pk, 'open': 1, 'total': 1})
+
+        stats.rebuild([self.team.pk])
+        self.assertEqual(self.snapshot(), data)
+
+    def test_one_row_per_bucket_and_zero_rows_removed(self):
+        tasks = [Task.objects.create(team=self.team, title=f'Task {i}', created_by=self.owner) for i in range(3)]
+        self.assertEqual(list(TeamTaskStats.objects.values_list('status', 'count')), [('todo', 3)])
+        for task in tasks:
+            task = Task.objects.get(pk=task.pk)
+            task.status = 'done'
+            task.save()
+        self.assertEqual(list(TeamTaskStats.objects.values_list('status', 'count')), [('done', 3)])
+        stats.apply_deltas({(TeamTaskStats, self.team.pk, 'todo', None): -1})
+        self.assertEqual(TeamTaskStats.objects.count(), 1)
+
+    def test_overdue_read_from_due_date_buckets(self):
+        past = timezone.localdate() - timedelta(days=1)
+        tasks = [Task.objects.create(team=self.team, title=f'Task {i}', due_date=past, created_by=self.owner)
+                 for i in range(3)]
+        task = Task.objects.get(pk=tasks[0].pk)
+        task.status = 'done'
+        task.save()
+        self.assertEqual(list(TeamTaskDueStats.objects.values_list('due_date', 'count')), [(past, 2)])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(stats.summarize([self.team.pk])[0]['overdue'], 2)
+        self.assertFalse(any('"user_task"' in q['sql'] for q in queries.captured_queries))
+
+    def test_deleted_assignee_moves_to_unassigned(self):
+        task = Task.objects.create(team=self.team, title='Assigned', assigned_to=self.member, created_by=self.owner)
+        self.member.delete()
+        self.assertEqual(list(TeamTaskStats.objects.values_list('assigned_to', 'count')), [(None, 1)])
+        self.assertEqual(self.snapshot()['by_assignee'], [{'user': None, 'open': 1, 'total': 1}])
+        self.team.delete()
+        self.assertFalse(TeamTaskStats.objects.exists())
+        self.assertFalse(Task.objects.filter(pk=task.pk).exists())
+
+    def test_all_teams_summary(self):
+        self.create_tasks(2)
+        data = self.client.get('/api/teams/stats/').data
+        self.assertEqual(data['totals']['total'], 2)
+        self.assertEqual([t['team'] for t in data['teams']], [self.team.pk])
+
+
+class SearchTests(APITestBase):
+    def search(self, url, term, **params):
+        return self.client.get(url, {'search': term, **params}).data['results']
+
+    def test_tasks_ranked_with_prefix_match(self):
+        weak = Task.objects.create(team=self.team, title='Release notes', description='Mention deploy once',
+                                   created_by=self.owner)
+        strong = Task.objects.create(team=self.team, title='Deploy deploy', description='Deployment checklist',
+                                     created_by=self.owner)
+        Task.objects.create(team=self.team, title='Unrelated', created_by=self.owner)
+        results = self.search('/api/tasks/', 'depl')
+        self.assertEqual([t['id'] for t in results], [strong.pk, weak.pk])
+        results = self.search('/api/tasks/', 'depl', ordering='created_at')
+        self.assertEqual([t['id'] for t in results], [weak.pk, strong.pk])
+
+    def test_ranked_results_paginate(self):
+        for i in range(5):
+            Task.objects.create(team=self.team, title='Report ' + 'report ' * i, created_by=self.owner)
+        first = self.client.get('/api/tasks/', {'search': 'report', 'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        ids = [t['id'] for t in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(second['next'])
+
+    def test_index_follows_writes(self):
+        task = Task.objects.create(team=self.team, title='Alpha', created_by=self.owner)
+        task.title = 'Beta'
+        task.save()
+        self.assertEqual(self.search('/api/tasks/', 'alpha'), [])
+        self.assertEqual(len(self.search('/api/tasks/', 'beta')), 1)
+        self.client.post('/api/tasks/bulk/', {'operations': [
+            {'op': 'update', 'id': task.pk, 'data': {'title': 'Gamma'}},
+            {'op': 'create', 'data': {'team': self.team.pk, 'title': 'Gamma two'}},
+        ]}, format='json')
+        self.assertEqual(len(self.search('/api/tasks/', 'gamma')), 2)
+        task.delete()
+        self.assertEqual(len(self.search('/api/tasks/', 'gamma')), 1)
+
+    def test_profile_search(self):
+        User.objects.create(username='carol', email='carol@example.com', first_name='Caroline')
+        results = self.search('/api/profile/', 'carol')
+        self.assertEqual([u['username'] for u in results], ['carol'])
+
+    def test_backend_available(self):
+        self.assertTrue(get_backend().available)
+
+
+class TaskFilterTests(APITestBase):
+    # filter -> (sample value, column the index must constrain)
+    SAMPLES = {
+        'status': ('todo', 'status'),
+        'status__in': ('todo,done', 'status'),
+        'assigned_to': ('1', 'assigned_to_id'),
+        'assigned_to__in': ('1,2', 'assigned_to_id'),
+        'team__in': ('1', 'team_id'),
+        'due_date': ('2030-01-01', 'due_date'),
+        'due_before': ('2030-01-01', 'due_date'),
+        'due_after': ('2030-01-01', 'due_date'),
+        'created_after': ('2030-01-01T00:00:00Z', 'created_at'),
+        'created_before': ('2030-01-01T00:00:00Z', 'created_at'),
+        'overdue': ('true', 'due_date'),
+    }
+
+    def ids(self, **params):
+        return {t['id'] for t in self.client.get('/api/tasks/', params).data['results']}
+
+    def test_filters_apply(self):
+        past = timezone.localdate() - timedelta(days=1)
+        late = Task.objects.create(team=self.team, title='Late', created_by=self.owner, due_date=past,
+                                   assigned_to=self.member)
+        done = Task.objects.create(team=self.team, title='Done', created_by=self.owner, due_date=past, status='done')
+        later = Task.objects.create(team=self.team, title='Later', created_by=self.owner,
+                                    due_date=past + timedelta(days=30), status='in_progress')
+        self.assertEqual(self.ids(status='done'), {done.pk})
+        self.assertEqual(self.ids(status__in='done,in_progress'), {done.pk, later.pk})
+        self.assertEqual(self.ids(assigned_to=self.member.pk), {late.pk})
+        self.assertEqual(self.ids(assigned_to__in=f'{self.member.pk},{self.owner.pk}'), {late.pk})
+        self.assertEqual(self.ids(team__in=self.team.pk), {late.pk, done.pk, later.pk})
+        self.assertEqual(self.ids(due_after=past + timedelta(days=1)), {later.pk})
+        self.assertEqual(self.ids(due_before=past), {late.pk, done.pk})
+        self.assertEqual(self.ids(overdue='true'), {late.pk})
+        self.assertEqual(self.ids(overdue='false'), {done.pk, later.pk})
+        self.assertEqual(self.ids(created_before='2000-01-01T00:00:00Z'), set())
+        self.assertEqual(self.client.get('/api/tasks/', {'status': 'DONE'}).status_code, 400)
+
+    def test_every_filter_uses_an_index(self):
+        self.assertEqual(set(self.SAMPLES), set(TaskFilter.base_filters))
+        self.create_tasks(3)
+        scoped = Task.objects.visible_to(self.owner).filter(is_deleted=False)
+        for name, (value, column) in self.SAMPLES.items():
+            with self.subTest(filter=name):
+                filterset = TaskFilter({name: value}, queryset=scoped)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                plan = filterset.qs.order_by().explain()
+                self.assertRegex(plan, rf'SEARCH user_task USING (COVERING )?INDEX task_\w+ \([^)]*\b{column}\b')
+
+
+
+class ActivityLogFilterTests(APITestBase):
+    SAMPLES = {
+        'task': '1',
+        'task__in': '1,2',
+        'action': 'created',
+        'action__in': 'created,deleted',
+        'team__in': '1',
+        'after': '2030-01-01T00:00:00Z',
+        'before': '2030-01-01T00:00:00Z',
+    }
+
+    def ids(self, **params):
+        return {log['id'] for log in self.client.get('/api/activity-logs/', params).data['results']}
+
+    def test_team_written_and_feed_scoped(self):
+        task = self.create_tasks(1)[0]
+        outsider = User.objects.create_user('outsider')
+        other = Team.objects.create(company=Company.objects.create(name='Other', owner=outsider), name='Other')
+        Task.objects.create(team=other, title='Hidden', created_by=outsider)
+        self.assertEqual(set(ActivityLog.objects.values_list('team_id', flat=True)), {self.team.pk, other.pk})
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.ids()
+        self.assertEqual(ids, set(task.activity_logs.values_list('id', flat=True)))
+        feed = next(q['sql'] for q in queries.captured_queries if 'FROM "user_activitylog"' in q['sql'])
+        self.assertNotIn('JOIN "user_task"', feed)
+
+    def test_history_follows_task_to_new_team(self):
+        task = self.create_tasks(1)[0]
+        other = Team.objects.create(company=self.company, name='Other')
+        TeamMembership.objects.create(user=self.owner, team=other, role='admin')
+        response = self.client.patch(f'/api/tasks/{task.pk}/', {'team': other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(task.activity_logs.values_list('team_id', flat=True)), {other.pk})
+        self.client.post('/api/tasks/bulk/', {'operations': [
+            {'op': 'update', 'id': task.pk, 'data': {'team': self.team.pk}},
+        ]}, format='json')
+        self.assertEqual(set(task.activity_logs.values_list('team_id', flat=True)), {self.team.pk})
+        self.assertEqual(self.ids(team__in=other.pk), set())
+
+    def test_filters_apply(self):
+        first, second = self.create_tasks(2)
+        second.soft_delete()
+        logs = {(log.task_id, log.action): log for log in ActivityLog.objects.all()}
+        self.assertEqual(self.ids(task=first.pk), {logs[first.pk, 'created'].pk})
+        self.assertEqual(self.ids(action='deleted'), {logs[second.pk, 'deleted'].pk})
+        self.assertEqual(self.ids(action__in='deleted,updated', task__in=f'{first.pk},{second.pk}'),
+                         {logs[second.pk, 'deleted'].pk})
+        timestamp = logs[second.pk, 'deleted'].timestamp
+        self.assertEqual(self.ids(after=timestamp.isoformat()), {logs[second.pk, 'deleted'].pk})
+        self.assertEqual(self.ids(before='2000-01-01T00:00:00Z'), set())
+        self.assertEqual(self.client.get('/api/activity-logs/', {'action': 'nope'}).status_code, 400)
+
+    def test_every_filter_uses_an_index(self):
+        self.assertEqual(set(self.SAMPLES), set(ActivityLogFilter.base_filters))
+        self.create_tasks(3)
+        scoped = ActivityLog.objects.visible_to(self.owner, [self.team.pk])
+        for name, value in self.SAMPLES.items():
+            with self.subTest(filter=name):
+                filterset = ActivityLogFilter({name: value}, queryset=scoped)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                plan = filterset.qs.order_by('-timestamp').explain()
+                self.assertRegex(plan, r'SEARCH user_activitylog USING (COVERING )?INDEX activity_\w+_time_idx')
+                self.assertNotIn('SCAN user_activitylog', plan)
+
+class CompactListTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.tasks = self.create_tasks(3)
+
+    def test_users_side_loaded_once(self):
+        data = self.client.get('/api/tasks/').data
+        row = data['results'][0]
+        self.assertIsInstance(row['created_by'], int)
+        self.assertIsInstance(row['assigned_to'], int)
+        expected = {self.owner.pk} | {task.assigned_to_id for task in self.tasks}
+        self.assertEqual(set(data['users']), expected)
+        self.assertEqual(data['users'][self.owner.pk]['username'], 'owner')
+
+    def test_sparse_fields_load_only_their_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/tasks/', {'fields': 'id,title,status,assigned_to'}).data
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'status', 'assigned_to'})
+        self.assertEqual(set(data['users']), {task.assigned_to_id for task in self.tasks})
+        page_sql = [q['sql'] for q in queries.captured_queries if 'LIMIT' in q['sql'] and '"user_task"' in q['sql']]
+        self.assertTrue(page_sql)
+        self.assertNotIn('"description"', page_sql[0])
+        self.assertNotIn('"user_user"', page_sql[0])
+
+    def test_expand_nests_relation(self):
+        data = self.client.get('/api/tasks/', {'expand': 'assigned_to'}).data
+        self.assertIsInstance(data['results'][0]['assigned_to'], dict)
+        self.assertEqual(set(data['users']), {self.owner.pk})
+        data = self.client.get('/api/tasks/', {'expand': 'assigned_to,created_by'}).data
+        self.assertNotIn('users', data)
+
+    def test_other_endpoints(self):
+        data = self.client.get('/api/activity-logs/').data
+        self.assertIsInstance(data['results'][0]['user'], (int, type(None)))
+        data = self.client.get('/api/companies/').data
+        self.assertEqual(data['results'][0]['owner'], self.owner.pk)
+        self.assertIn(self.owner.pk, data['users'])
+        detail = self.client.get(f'/api/tasks/{self.tasks[0].pk}/').data
+        self.assertEqual(detail['created_by']['id'], self.owner.pk)
+
+    def test_team_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/teams/', {'fields': 'id,name'}).data
+        self.assertEqual(data['results'], [{'id': self.team.pk, 'name': self.team.name}])
+        page_sql = [q['sql'] for q in queries.captured_queries if 'LIMIT' in q['sql'] and '"user_team"' in q['sql']]
+        self.assertNotIn('"description"', page_sql[0])
+
+
+class RowSerializerTests(APITestBase):
+    """The values() fast path must render exactly what the serializers do."""
+
+    def setUp(self):
+        super().setUp()
+        tasks = self.create_tasks(4)
+        Task.objects.filter(pk=tasks[0].pk).update(assigned_to=None, due_date=date(2030, 1, 2), description='')
+        Task.objects.filter(pk=tasks[1].pk).update(description='Ünïcode "quoted"', status='done')
+
+    def assertSameBytes(self, viewset, url, **params):
+        fast = self.client.get(url, params)
+        with mock.patch.object(viewset, 'row_serializer', False):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.status_code, 200, fast.content)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_task_list(self):
+        for params in ({}, {'expand': 'created_by,assigned_to'}, {'fields': 'id,title,due_date'},
+                       {'ordering': 'due_date'}, {'search': 'task'}, {'page': 1}, {'page_size': 2}):
+            with self.subTest(**params):
+                self.assertSameBytes(TaskViewSet, '/api/tasks/', **params)
+
+    def test_activity_log_and_company_lists(self):
+        self.assertSameBytes(ActivityLogViewSet, '/api/activity-logs/')
+        self.assertSameBytes(ActivityLogViewSet, '/api/activity-logs/', expand='user')
+        self.assertSameBytes(CompanyViewSet, '/api/companies/', expand='owner')
+        self.assertSameBytes(TeamViewSet, '/api/teams/')
+
+    def test_team_members(self):
+        members = TeamMembership.objects.filter(team=self.team).order_by('id')
+        rows = RowSerializer(TeamMemberSerializer())
+        self.assertEqual(
+            JSONRenderer().render(rows.serialize(rows.values(members))),
+            JSONRenderer().render(TeamMemberSerializer(members, many=True).data),
+        )
+
+    def test_fast_path_skips_model_instances(self):
+        with mock.patch.object(Task, 'from_db', side_effect=AssertionError('model instantiated')):
+            self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+
+
+class ORJSONRendererTests(APITestBase):
+    def payload(self):
+        from collections import OrderedDict
+        from decimal import Decimal
+        from uuid import UUID
+        from django.utils.translation import gettext_lazy
+        now = timezone.now()
+        return {
+            'aware': now, 'naive': now.replace(tzinfo=None), 'date': now.date(), 'time': now.time(),
+            'delta': timedelta(hours=1, microseconds=5), 'decimal': Decimal('1.50'),
+            'uuid': UUID(int=7), 'lazy': gettext_lazy('Done'), 'ids': {1: 'a', 2: None},
+            'ordered': OrderedDict(b=1, a=[True, False, None]), 'text': 'Ünï\u2028line\u2029sep "q"',
+            'queryset': User.objects.filter(pk=self.owner.pk).values_list('username', flat=True),
+            'float': 0.1,
+        }
+
+    def test_matches_json_renderer(self):
+        payload = self.payload()
+        self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(ORJSONRenderer().render({'huge': 2 ** 70}), b'{"huge":1180591620717411303424}')
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        indented = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(indented, JSONRenderer().render({'a': 1}, 'application/json; indent=4'))
+
+    def test_api_responses_match(self):
+        self.create_tasks(3)
+        for url in ('/api/tasks/', '/api/activity-logs/', f'/api/teams/{self.team.pk}/members/'):
+            response = self.client.get(url)
+            self.assertEqual(ORJSONRenderer().render(response.data), response.content)
+
+    def test_parser(self):
+        import io
+        from rest_framework.exceptions import ParseError
+        body = '{"title": "Ünï", "n": 18446744073709551616, "items": [1, 2.5, null]}'.encode()
+        parsed = ORJSONParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed, {'title': 'Ünï', 'n': 2 ** 64, 'items': [1, 2.5, None]})
+        for body in (b'{"a": NaN}', b'{"a":'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as fast:
+                    ORJSONParser().parse(io.BytesIO(body))
+                with self.assertRaises(ParseError) as slow:
+                    JSONParser().parse(io.BytesIO(body))
+                self.assertEqual(str(fast.exception), str(slow.exception))
+
+
+class CachedJWTAuthenticationTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.owner)}')
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [q['sql'] for q in queries.captured_queries if 'FROM "user_user" WHERE "user_user"."id" = ' in q['sql']]
+
+    def test_user_cached_until_saved(self):
+        self.assertEqual(len(self.user_queries('/api/tasks/')), 1)
+        self.assertEqual(self.user_queries('/api/tasks/'), [])
+        self.owner.first_name = 'Renamed'
+        self.owner.save()
+        self.assertEqual(len(self.user_queries('/api/tasks/')), 1)
+        self.assertEqual(self.client.get('/api/profile/me/').data['first_name'], 'Renamed')
+
+    def test_cache_holds_no_password(self):
+        self.client.get('/api/tasks/')
+        values, revoke = cache.get(USER_KEY.format(self.owner.pk))
+        self.assertNotIn('password', values)
+        self.assertNotIn(self.owner.password, values.values())
+        self.assertIsNone(revoke)
+        response = self.client.get('/api/profile/me/')
+        self.assertEqual(response.data['email'], self.owner.email)
+
+    def test_user_cached_before_commit_is_evicted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.is_active = False
+            self.owner.save()
+            self.client.get('/api/tasks/')
+            self.assertIsNotNone(cache.get(USER_KEY.format(self.owner.pk)))
+        self.assertIsNone(cache.get(USER_KEY.format(self.owner.pk)))
+
+    def test_deactivation_and_deletion_apply_immediately(self):
+        self.client.get('/api/tasks/')
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 401)
+        self.owner.is_active = True
+        self.owner.save()
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+        self.owner.delete()
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 401)
+
+    def test_invalid_token_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 401)
+
+    @override_settings(JWT_AUTH_CACHE={'STATELESS_READS': True})
+    def test_stateless_reads(self):
+        self.create_tasks(2)
+        cache.clear()
+        self.assertEqual(self.user_queries('/api/tasks/'), [])
+        self.assertEqual(self.client.get('/api/tasks/').data['results'][0]['created_by'], self.owner.pk)
+        self.assertEqual(len(self.user_queries('/api/profile/me/')), 1)
+        response = self.client.post('/api/tasks/', {'team': self.team.pk, 'title': 'Write'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created_by']['id'], self.owner.pk)
+
+
+class MetricsTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def histogram(self, name, route):
+        return registry.histograms[(name, (route, 'GET'))]
+
+    def test_records_per_route(self):
+        self.create_tasks(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/tasks/')
+        self.assertEqual(self.histogram('http_request_db_queries', 'task-list').sum, len(queries.captured_queries))
+        self.assertGreater(self.histogram('http_request_serializer_duration_seconds', 'task-list').sum, 0)
+        self.client.get(f'/api/teams/{self.team.pk}/members/')
+        self.assertEqual(self.histogram('http_request_duration_seconds', 'team-members').count, 1)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_db_queries_count{route="task-list",method="GET"} 1', body)
+        self.assertIn('http_response_size_bytes_bucket{route="team-members",method="GET",le="+Inf"} 1', body)
+        self.assertIn('team_role_cache_misses_total', body)
+        self.assertIn('event_broker_subscribers 0', body)
+
+    def test_metrics_endpoint_is_local_only(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 403)
+
+    @override_settings(METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_request_log_includes_sql(self):
+        with self.assertLogs('user.metrics', 'WARNING') as logs:
+            self.client.get('/api/tasks/')
+        self.assertIn('/api/tasks/ (task-list)', logs.output[0])
+        self.assertIn('FROM "user_task"', logs.output[0])
+
+    async def test_async_views_measured(self):
+        await sync_to_async(self.create_tasks)(2)
+        token = await sync_to_async(AccessToken.for_user)(self.owner)
+        response = await self.async_client.get('/api/async/tasks/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.histogram('http_request_db_queries', 'async-task-list').sum, 0)
+
+
+class ExportTests(APITestBase):
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_task_ndjson_matches_api(self):
+        tasks = self.create_tasks(3)
+        outsider = User.objects.create_user('outsider')
+        other = Team.objects.create(company=Company.objects.create(name='Other', owner=outsider), name='Other')
+        Task.objects.create(team=other, title='Hidden', created_by=outsider)
+        rows = [json.loads(line) for line in self.export('/api/tasks/export/').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [task.pk for task in tasks])
+        detail = self.client.get(f'/api/tasks/{tasks[0].pk}/').data
+        self.assertEqual(rows[0]['created_at'], detail['created_at'])
+        self.assertEqual(rows[0]['created_by_username'], 'owner')
+        self.assertEqual(rows[0]['assigned_to_username'], tasks[0].assigned_to.username)
+
+    def test_task_csv_honours_filters(self):
+        tasks = self.create_tasks(3)
+        Task.objects.filter(pk=tasks[1].pk).update(status='done')
+        lines = list(csv.reader(io.StringIO(self.export('/api/tasks/export/', output='csv', status='done'))))
+        self.assertEqual(lines[0][:3], ['id', 'team', 'title'])
+        self.assertEqual([line[0] for line in lines[1:]], [str(tasks[1].pk)])
+        self.assertEqual(lines[1][lines[0].index('due_date')], '')
+
+    def test_activity_log_export_streams_in_chunks(self):
+        self.create_tasks(5)
+        with mock.patch.object(ActivityLogViewSet, 'export_chunk_size', 2):
+            response = self.client.get('/api/activity-logs/export/')
+            chunks = list(response.streaming_content)
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        self.assertEqual(len(rows), ActivityLog.objects.count())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(set(rows[0]), {'id', 'team', 'task', 'action', 'note', 'timestamp', 'user', 'user_username'})
+        self.assertIn('attachment; filename="activity-logs-', response['Content-Disposition'])
+
+    def test_unknown_output_rejected(self):
+        self.assertEqual(self.client.get('/api/tasks/export/', {'output': 'xml'}).status_code, 400)
+
+
+class ImportTests(APITestBase):
+    def upload(self, url, content, name, **params):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(f'{url}?{urlencode(params)}', {'file': upload}, format='multipart')
+
+    def test_task_import_reports_row_errors(self):
+        other = Team.objects.create(company=self.company, name='Other')
+        content = '\n'.join([
+            'team,title,status,due_date,assigned_to,description',
+            f'{self.team.pk},First,todo,2030-01-01,{self.member.pk},',
+            f'{self.team.pk},,todo,,,missing title',
+            f'{self.team.pk},Second,blocked,,,',
+            f'{other.pk},Elsewhere,todo,,,',
+            f'{self.team.pk},Third,done,not-a-date,,',
+            f'{self.team.pk},Fourth,done,,{self.member.pk},"multi\nline"',
+        ])
+        with mock.patch.object(TaskImporter, 'batch_size', 2), CaptureQueriesContext(connection) as queries:
+            data = self.upload('/api/tasks/import/', content, 'tasks.csv').data
+        self.assertEqual((data['rows'], data['created'], data['failed']), (6, 2, 4))
+        self.assertEqual({e['line']: set(e['errors']) for e in data['errors']},
+                         {3: {'title'}, 4: {'status'}, 5: {'team'}, 6: {'due_date'}})
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "user_task"')]
+        self.assertEqual(len(inserts), 2)
+
+        first, fourth = Task.objects.filter(team=self.team).order_by('id')
+        self.assertEqual((first.assigned_to, first.due_date, first.created_by), (self.member, date(2030, 1, 1), self.owner))
+        self.assertEqual(fourth.description, 'multi\nline')
+        self.assertEqual(ActivityLog.objects.filter(action='created').count(), 2)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/stats/').data['total'], 2)
+        self.assertEqual([t['id'] for t in self.client.get('/api/tasks/', {'search': 'fourth'}).data['results']],
+                         [fourth.pk])
+
+    def test_task_import_ndjson(self):
+        content = '\n'.join([
+            json.dumps({'team': self.team.pk, 'title': 'From JSON', 'assigned_to': self.owner.pk}),
+            '{"team": ',
+            '[1, 2]',
+            json.dumps({'team': self.team.pk, 'title': 'Unassignable', 'assigned_to': 999999}),
+            '',
+        ])
+        data = self.upload('/api/tasks/import/', content, 'upload.txt', input='ndjson').data
+        self.assertEqual((data['rows'], data['created'], data['failed']), (4, 1, 3))
+        self.assertEqual([e['line'] for e in data['errors']], [2, 3, 4])
+        self.assertEqual(self.upload('/api/tasks/import/', content, 'upload.txt').status_code, 400)
+
+    def test_bad_encoding_and_types_reported_per_line(self):
+        content = f'team,title\n{self.team.pk},Good\n{self.team.pk},Bad \xff\n'.encode('latin-1')
+        upload = SimpleUploadedFile('tasks.csv', content)
+        data = self.client.post('/api/tasks/import/', {'file': upload}, format='multipart').data
+        self.assertEqual((data['created'], data['failed']), (1, 1))
+        self.assertEqual(data['errors'][0]['line'], 3)
+
+        content = json.dumps({'team': self.team.pk, 'title': 'Typed', 'due_date': 5, 'status': ['todo']})
+        data = self.upload('/api/tasks/import/', content, 'tasks.ndjson').data
+        self.assertEqual(set(data['errors'][0]['errors']), {'due_date', 'status'})
+
+    def test_member_import(self):
+        users = [User.objects.create_user(f'new{i}', f'new{i}@example.com') for i in range(3)]
+        content = '\n'.join([
+            json.dumps({'user': users[0].pk}),
+            json.dumps({'username': 'new1', 'role': 'admin'}),
+            json.dumps({'email': 'new2@example.com'}),
+            json.dumps({'username': 'member', 'role': 'admin'}),
+            json.dumps({'username': 'nobody'}),
+            json.dumps({'user': users[0].pk, 'role': 'owner'}),
+        ])
+        response = self.upload(f'/api/teams/{self.team.pk}/import-members/', content, 'members.ndjson')
+        data = response.data
+        self.assertEqual((data['created'], data['updated'], data['failed']), (3, 1, 2))
+        roles = dict(TeamMembership.objects.filter(team=self.team).values_list('user__username', 'role'))
+        self.assertEqual(roles, {'owner': 'admin', 'member': 'admin', 'new0': 'member', 'new1': 'admin', 'new2': 'member'})
+
+        self.client.force_authenticate(self.member)
+        TeamMembership.objects.filter(user=self.member).update(role='member')
+        cache.clear()
+        response = self.upload(f'/api/teams/{self.team.pk}/import-members/', content, 'members.ndjson')
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write(f'team,title\n{self.team.pk},Via command\n{self.team.pk},\n')
+            f.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_data', 'tasks', f.name, user='owner', stdout=out, stderr=err)
+        self.assertIn('2 rows', out.getvalue())
+        self.assertIn('1 created', out.getvalue())
+        self.assertIn('line 3', err.getvalue())
+        self.assertTrue(Task.objects.filter(title='Via command', created_by=self.owner).exists())
+
+
+class RetentionTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.now = timezone.now()
+        first, second = self.create_tasks(2)
+        second.title = 'Renamed'
+        second.save()
+        old = self.now - timedelta(days=100)
+        ActivityLog.objects.filter(task=first).update(timestamp=old)
+        ActivityLog.objects.filter(task=second, action='updated').update(timestamp=old - timedelta(days=1))
+        self.recent = ActivityLog.objects.get(task=second, action='created')
+
+    def archive(self, *args):
+        out = io.StringIO()
+        with override_settings(ACTIVITY_LOG_RETENTION={'DAYS': 365, 'ACTIONS': {'updated': 90}}):
+            call_command('archive_activity_logs', *args, stdout=out)
+        return out.getvalue()
+
+    def test_archives_expired_rows_in_batches(self):
+        self.assertIn('updated    1 rows to archive', self.archive('--dry-run'))
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        self.archive('--days', '30', '--batch-size', '1')
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [self.recent.pk])
+        archives = list(ActivityLogArchive.objects.order_by('start'))
+        self.assertEqual([a.row_count for a in archives], [1, 1])
+        with archives[0].file.open('rb') as stream:
+            row = json.loads(gzip.decompress(stream.read()))
+        self.assertEqual((row['action'], row['team'], row['user_username']), ('updated', self.team.pk, 'owner'))
+        rollups = ActivityLogRollup.objects.values_list('action', 'count')
+        self.assertEqual(sorted(rollups), [('created', 1), ('updated', 1)])
+
+    def test_archived_history_stays_queryable(self):
+        before = self.client.get('/api/activity-logs/daily/').data
+        self.archive('--days', '30')
+        self.assertEqual(self.client.get('/api/activity-logs/daily/').data, before)
+        self.assertEqual(sum(row['count'] for row in before), 3)
+        day = (self.now - timedelta(days=100)).date().isoformat()
+        data = self.client.get('/api/activity-logs/daily/', {'after': day, 'before': day}).data
+        self.assertEqual([row['action'] for row in data], ['created'])
+
+        lines = self.client.get('/api/activity-archives/export/').streaming_content
+        rows = [json.loads(line) for chunk in lines for line in chunk.splitlines()]
+        self.assertEqual([row['action'] for row in rows], ['updated', 'created'])
+        csv_body = b''.join(self.client.get('/api/activity-archives/export/', {
+            'output': 'csv', 'after': (self.now - timedelta(days=100, minutes=1)).isoformat(),
+        }).streaming_content).decode()
+        self.assertEqual([line['action'] for line in csv.DictReader(io.StringIO(csv_body))], ['created'])
+        self.assertEqual(self.client.get('/api/activity-archives/').data['count'], 1)
+
+        self.client.force_authenticate(User.objects.create_user('outsider'))
+        self.assertEqual(self.client.get('/api/activity-archives/').data['count'], 0)
+        self.assertEqual(list(self.client.get('/api/activity-archives/export/').streaming_content), [])
+
+    def test_rows_taken_by_another_run_are_not_counted_twice(self):
+        save = default_storage.save
+
+        def save_after_other_run(name, content):
+            ActivityLog.objects.filter(action='updated').delete()
+            return save(name, content)
+
+        with mock.patch('user.retention.default_storage.save', side_effect=save_after_other_run):
+            self.archive('--days', '30')
+        self.assertFalse(ActivityLogArchive.objects.exists())
+        self.assertFalse(ActivityLogRollup.objects.exists())
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertEqual(default_storage.listdir(f'activity-archive/team-{self.team.pk}'), ([], []))
+
+    def test_deleting_team_removes_archive_files(self):
+        self.archive('--days', '30')
+        name = ActivityLogArchive.objects.get().file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.delete()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_actions_can_be_kept_forever(self):
+        self.archive('--days', '30', '--action-days', 'updated=none')
+        self.assertEqual(set(ActivityLog.objects.values_list('action', flat=True)), {'created', 'updated'})
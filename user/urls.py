@@ -1,6 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import *
+from . import async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 router = DefaultRouter()
@@ -10,8 +11,14 @@ router.register(r'companies', CompanyViewSet, basename='company')
 router.register(r'teams', TeamViewSet, basename='team')
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'activity-logs', ActivityLogViewSet, basename='activity-log')
+router.register(r'activity-archives', ActivityLogArchiveViewSet, basename='activity-archive')
 
 urlpatterns = [
+    path('tasks/stream/', async_views.task_stream, name='task-stream'),
+    path('async/tasks/', async_views.task_list, name='async-task-list'),
+    path('async/tasks/<int:pk>/', async_views.task_detail, name='async-task-detail'),
+    path('async/activity-logs/', async_views.activity_log_list, name='async-activity-log-list'),
+    path('async/profile/me/', async_views.profile_me, name='async-profile-me'),
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
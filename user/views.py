@@ -1,16 +1,32 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import *
 from .serializers import *
 from .permissions import *
-from .filters import TaskFilter
+from .filters import ActivityLogArchiveFilter, ActivityLogFilter, TaskFilter
+from .pagination import TaskPagination, ActivityLogPagination
+from .mixins import (
+    CompactListMixin, ConditionalResponseMixin, USER_PROFILE_FIELDS,
+    conditional_response, digest_etag, set_validators,
+)
+from .roles import get_team_roles
+from .bulk import BulkTaskProcessor, MAX_OPERATIONS
+from .changes import task_changes, activity_changes
+from . import stats
+from .search import FullTextSearchFilter
+from .fastpath import RowSerializer
+from .exports import ACTIVITY_LOG_COLUMNS, ExportMixin, requested_output, stream_response
+from .importers import MembershipImporter, TaskImporter, read_upload
+from .retention import NAMES as ARCHIVE_COLUMNS, archived_rows, daily_counts
 from rest_framework import filters
+from django_filters.rest_framework import DjangoFilterBackend
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -25,34 +41,40 @@ class ProfileViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     queryset = User.objects.all()
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['username', 'email', 'first_name', 'last_name']
 
     @action(detail=False, methods=['get'])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
-
-class CompanyViewSet(viewsets.ModelViewSet):
+        user = request.user
+        etag = digest_etag(*(getattr(user, field) for field in USER_PROFILE_FIELDS))
+        response = conditional_response(request, etag)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(user)
+        return set_validators(Response(serializer.data), etag)
+
+class CompanyViewSet(ConditionalResponseMixin, CompactListMixin, viewsets.ModelViewSet):
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticated]
+    select_related_fields = {'owner': USER_PROFILE_FIELDS}
+    only_fields = ('id', 'name', 'owner', 'created_at', 'updated_at')
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Company.objects.none()
 
         user = self.request.user
-        return Company.objects.filter(
-            Q(owner=user) |
-            Q(teams__memberships__user=user)
-        ).distinct()
+        team_ids = get_team_roles(self.request).team_ids()
+        return self.optimize_queryset(Company.objects.visible_to(user, team_ids))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ConditionalResponseMixin, CompactListMixin, viewsets.ModelViewSet):
     serializer_class = TeamSerializer
     permission_classes = [IsAuthenticated]
+    only_fields = ('id', 'company', 'name', 'description', 'created_at', 'updated_at')
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -64,26 +86,43 @@ class TeamViewSet(viewsets.ModelViewSet):
         if company_id:
             qs = qs.filter(company_id=company_id)
 
-        return qs.filter(
-            Q(company__owner=self.request.user) |
-            Q(memberships__user=self.request.user)
-        ).distinct()
+        return self.optimize_queryset(qs.visible_to(self.request.user, get_team_roles(self.request).team_ids()))
 
     def perform_create(self, serializer):
         team = serializer.save()
         TeamMembership.objects.create(user=self.request.user, team=team, role='admin')
+        get_team_roles(self.request).set(team, 'admin')
+
+    @action(detail=True, methods=['get'], url_path='stats', url_name='stats')
+    def team_stats(self, request, pk=None):
+        team = self.get_object()
+        return Response(stats.summarize([team.pk])[0])
+
+    @action(detail=False, methods=['get'], url_path='stats', url_name='all-stats')
+    def all_stats(self, request):
+        team_ids = sorted(get_team_roles(request).team_ids())
+        teams = stats.summarize(team_ids)
+        totals = {
+            'total': sum(t['total'] for t in teams),
+            'overdue': sum(t['overdue'] for t in teams),
+            'by_status': {
+                value: sum(t['by_status'].get(value, 0) for t in teams) for value, _ in Task.STATUS_CHOICES
+            },
+        }
+        return Response({'teams': teams, 'totals': totals})
 
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
         team = self.get_object()
-        members = TeamMembership.objects.filter(team=team)
-        serializer = TeamMemberSerializer(members, many=True)
-        return Response(serializer.data)
+        rows = RowSerializer(TeamMemberSerializer())
+        members = rows.values(TeamMembership.objects.filter(team=team).order_by('id'))
+        return Response(rows.serialize(members))
 
     @action(detail=True, methods=['post'], url_path='add-member')
     def add_member(self, request, pk=None):
         team = self.get_object()
-        if not TeamMembership.objects.filter(team=team, user=request.user, role='admin').exists():
+        roles = get_team_roles(request)
+        if not roles.is_admin(team):
             return Response({'detail': 'Only admins can add members'}, status=403)
         user_id = request.data.get('user_id')
         role = request.data.get('role', 'member')
@@ -92,57 +131,88 @@ class TeamViewSet(viewsets.ModelViewSet):
         if not created:
             membership.role = role
             membership.save()
+        if user.pk == request.user.pk:
+            roles.set(team, role)
         return Response(TeamMemberSerializer(membership).data)
 
+    @action(detail=True, methods=['post'], url_path='import-members', parser_classes=[MultiPartParser])
+    def import_members(self, request, pk=None):
+        team = self.get_object()
+        if not get_team_roles(request).is_admin(team):
+            return Response({'detail': 'Only admins can add members'}, status=403)
+        result = MembershipImporter(team).run(read_upload(request))
+        return Response(result.as_dict())
+
     @action(detail=True, methods=['post'], url_path='remove-member')
     def remove_member(self, request, pk=None):
         team = self.get_object()
-        if not TeamMembership.objects.filter(team=team, user=request.user, role='admin').exists():
+        roles = get_team_roles(request)
+        if not roles.is_admin(team):
             return Response({'detail': 'Only admins can remove members'}, status=403)
         user_id = request.data.get('user_id')
         membership = get_object_or_404(TeamMembership, team=team, user_id=user_id)
-        if membership.user == team.company.owner:
+        if membership.user_id == team.company.owner_id:
             return Response({'detail': 'Cannot remove company owner'}, status=400)
         membership.delete()
+        if membership.user_id == request.user.pk:
+            roles.discard(team)
         return Response({'detail': 'removed'})
 
     @action(detail=True, methods=['post'], url_path='change-role')
     def change_role(self, request, pk=None):
         team = self.get_object()
-        if not TeamMembership.objects.filter(team=team, user=request.user, role='admin').exists():
+        roles = get_team_roles(request)
+        if not roles.is_admin(team):
             return Response({'detail': 'Only admins can change roles'}, status=403)
         user_id = request.data.get('user_id')
         role = request.data.get('role')
         membership = get_object_or_404(TeamMembership, team=team, user_id=user_id)
         membership.role = role
         membership.save()
+        if membership.user_id == request.user.pk:
+            roles.set(team, role)
         return Response(TeamMemberSerializer(membership).data)
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ExportMixin, ConditionalResponseMixin, CompactListMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    select_related_fields = {'created_by': USER_PROFILE_FIELDS, 'assigned_to': USER_PROFILE_FIELDS}
+    only_fields = (
+        'id', 'team', 'title', 'description', 'created_by', 'assigned_to', 'status',
+        'due_date', 'created_at', 'updated_at', 'is_deleted', 'deleted_at',
+    )
     filterset_class = TaskFilter
     search_fields = ['title', 'description'] 
     ordering_fields = ['due_date', 'created_at']
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter,)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter,)
+    pagination_class = TaskPagination
+    stateless_auth = True
+    export_basename = 'tasks'
+    export_columns = (
+        ('id', 'id'), ('team', 'team_id'), ('title', 'title'), ('description', 'description'),
+        ('status', 'status'), ('due_date', 'due_date'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ('created_by', 'created_by_id'), ('created_by_username', 'created_by__username'),
+        ('assigned_to', 'assigned_to_id'), ('assigned_to_username', 'assigned_to__username'),
+    )
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Task.objects.none()
 
-        qs = Task.objects.filter(is_deleted=False)
-        return qs.filter(team__memberships__user=self.request.user).distinct()
+        team_ids = get_team_roles(self.request).team_ids()
+        qs = Task.objects.visible_to(self.request.user, team_ids).filter(is_deleted=False)
+        return self.optimize_queryset(qs)
     
     def create(self, request, *args, **kwargs):
         team_id = request.data.get("team")
-        if not TeamMembership.objects.filter(team_id=team_id, user=request.user, role="admin").exists():
+        if not get_team_roles(request).is_admin(team_id):
             return Response({"detail": "Only admins can create tasks"}, status=403)
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         team = serializer.validated_data['team']
-        if not TeamMembership.objects.filter(team=team, user=self.request.user, role='admin').exists():
-            return Response({'detail': 'Only team admins can create tasks'}, status=403)
+        if not get_team_roles(self.request).is_admin(team):
+            raise PermissionDenied('Only team admins can create tasks')
         serializer.save(created_by=self.request.user)
 
     def get_serializer_class(self):
@@ -153,7 +223,7 @@ class TaskViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        if not TeamMembership.objects.filter(team=instance.team, user=request.user, role='admin').exists():
+        if not get_team_roles(request).is_admin(instance.team_id):
             return Response({'detail': 'Only admins can delete tasks'}, status=403)
 
         instance.soft_delete()
@@ -161,40 +231,118 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        if TeamMembership.objects.filter(team=instance.team, user=request.user, role='admin').exists():
+        response = self.check_preconditions(request, instance)
+        if response is not None:
+            return response
+        roles = get_team_roles(request)
+        if roles.is_admin(instance.team_id):
             return super().update(request, *args, **kwargs)
-        if TeamMembership.objects.filter(team=instance.team, user=request.user).exists():
+        if roles.is_member(instance.team_id):
             serializer = TaskUpdateMemberSerializer(instance, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
-            return Response(TaskSerializer(instance).data)
+            return set_validators(Response(TaskSerializer(instance).data), *self.get_detail_validators(instance))
         return Response({'detail': 'Not allowed'}, status=403)
 
     @action(detail=True, methods=['post'], url_path='assign')
     def assign(self, request, pk=None):
         instance = self.get_object()
-        if not TeamMembership.objects.filter(team=instance.team, user=request.user, role='admin').exists():
+        if not get_team_roles(request).is_admin(instance.team_id):
             return Response({'detail': 'Only admins can assign tasks'}, status=403)
         user_id = request.data.get('user_id')
         user = get_object_or_404(User, pk=user_id)
-        if not TeamMembership.objects.filter(team=instance.team, user=user).exists():
+        if not TeamMembership.objects.filter(team_id=instance.team_id, user=user).exists():
             return Response({'detail': 'User not a member of the team'}, status=400)
         instance.assigned_to = user
         instance.save()
         return Response(TaskSerializer(instance).data)
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        operations = request.data.get('operations') if hasattr(request.data, 'get') else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'detail': 'operations must be a non-empty list'}, status=400)
+        if len(operations) > MAX_OPERATIONS:
+            return Response({'detail': f'At most {MAX_OPERATIONS} operations per request'}, status=400)
+        results = BulkTaskProcessor(request, self.get_queryset()).run(operations)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import', url_name='import', parser_classes=[MultiPartParser])
+    def import_tasks(self, request):
+        admin_teams = get_team_roles(request).admin_team_ids()
+        result = TaskImporter(request.user, admin_teams).run(read_upload(request))
+        return Response(result.as_dict())
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        team_ids = get_team_roles(request).team_ids()
+        queryset = self.optimize_queryset(Task.objects.visible_to(request.user, team_ids))
+        rows, token, has_more = task_changes(queryset, request)
+        return Response({
+            'changes': TaskSerializer([task for task in rows if not task.is_deleted], many=True).data,
+            'deleted': [{'id': task.pk, 'deleted_at': task.deleted_at} for task in rows if task.is_deleted],
+            'next_token': token,
+            'has_more': has_more,
+        })
+
+class ActivityLogViewSet(ExportMixin, CompactListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAuthenticated]
+    select_related_fields = {'user': USER_PROFILE_FIELDS}
+    only_fields = ('id', 'task', 'user', 'action', 'timestamp', 'note')
+    filterset_class = ActivityLogFilter
+    pagination_class = ActivityLogPagination
+    stateless_auth = True
+    export_basename = 'activity-logs'
+    export_columns = ACTIVITY_LOG_COLUMNS
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Task.objects.none()
         
         user = self.request.user
-        return ActivityLog.objects.filter(
-            task__team__memberships__user=user
-        ).order_by('-timestamp') 
+        team_ids = get_team_roles(self.request).team_ids()
+        return self.optimize_queryset(ActivityLog.objects.visible_to(user, team_ids).order_by('-timestamp'))
 
-        
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        rows, token, has_more = activity_changes(self.get_queryset(), request)
+        return Response({
+            'changes': ActivityLogSerializer(rows, many=True).data,
+            'next_token': token,
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        query = DailyActivityQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        team_ids = get_team_roles(request).team_ids()
+        team = query.validated_data.get('team')
+        if team is not None:
+            team_ids = [team] if team in team_ids else []
+        after, before = query.validated_data.get('after'), query.validated_data.get('before')
+        return Response(daily_counts(team_ids, after, before))
+
+class ActivityLogArchiveViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = ActivityLogArchiveSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_class = ActivityLogArchiveFilter
+    filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ActivityLogArchive.objects.none()
+        team_ids = get_team_roles(self.request).team_ids()
+        return ActivityLogArchive.objects.filter(team_id__in=team_ids).order_by('start', 'id')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the archived logs of the matching archives, limited to the ``after``/``before`` range."""
+        output = requested_output(request)
+        filterset = self.filterset_class(request.query_params, queryset=self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        bounds = filterset.form.cleaned_data
+        rows = archived_rows(filterset.qs.iterator(), bounds.get('after'), bounds.get('before'))
+        return stream_response(ARCHIVE_COLUMNS, rows, 'activity-archive', output)